@@ -1,62 +1,178 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
 from flask_socketio import SocketIO, emit
 import asyncio
 import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import logging
+from log_config import configure_logging, log_payload
 from mcp_chatbot import MCP_ChatBot
-import nest_asyncio
-import functools
+from metrics import metrics, observe, span
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Set up logging (queued, with per-category levels; see log_config.py)
+configure_logging()
 logger = logging.getLogger('mcp_chatbot_web')
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
-socketio = SocketIO(app, cors_allowed_origins="*")  # Let Flask-SocketIO choose the best async mode
-
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
+# Replies are emitted from the background event loop thread, so use an async
+# mode that works with plain OS threads unless told otherwise
+socketio = SocketIO(app, cors_allowed_origins="*",
+                    async_mode=os.environ.get("SOCKETIO_ASYNC_MODE", "threading"))
 
 # Load environment variables
 load_dotenv()
 
-# Initialize chatbot
-chatbot = None
+# All chatbot work runs on one event loop in a background thread. Socket
+# handlers submit coroutines to it and return immediately, so a slow query
+# from one client never holds up another.
 loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
+loop_thread = threading.Thread(target=loop.run_forever, name="chatbot-loop", daemon=True)
+loop_thread.start()
+
+# Shared chatbot holding the MCP server connections
+chatbot = None
+chatbot_lock = threading.Lock()
+
 
 def initialize_chatbot():
     global chatbot
-    if chatbot is None:
-        chatbot = MCP_ChatBot()
-        loop.run_until_complete(chatbot.connect_to_servers())
-        logger.info("Chatbot initialized")
+    with chatbot_lock:
+        if chatbot is None:
+            bot = MCP_ChatBot()
+            asyncio.run_coroutine_threadsafe(bot.connect_to_servers(), loop).result()
+            chatbot = bot
+            logger.info("Chatbot initialized")
     return chatbot
 
+
+class SessionManager:
+    """
+    Conversation state per Socket.IO client.
+
+    Every client gets its own message history, while the MCP server sessions
+    and OpenAI client are shared through the main chatbot. Requests from the
+    same client are processed in order; different clients run concurrently.
+    """
+
+    def __init__(self):
+        self._conversations = {}
+        self._locks = {}
+        self._mutex = threading.Lock()
+
+    def get(self, sid):
+        with self._mutex:
+            conversation = self._conversations.get(sid)
+            if conversation is None:
+                conversation = self._conversations[sid] = initialize_chatbot().new_conversation()
+            return conversation
+
+    def lock(self, sid):
+        """asyncio.Lock serializing one client's requests (use on the loop thread)."""
+        with self._mutex:
+            return self._locks.setdefault(sid, asyncio.Lock())
+
+    def drop(self, sid):
+        with self._mutex:
+            self._conversations.pop(sid, None)
+            self._locks.pop(sid, None)
+
+    def __len__(self):
+        return len(self._conversations)
+
+
+sessions = SessionManager()
+
+
+def send(sid, event, data):
+    """Emit an event to a single client from any thread."""
+    socketio.emit(event, data, to=sid)
+
+
+def submit(sid, coro, kind="query"):
+    """
+    Schedule a coroutine on the background loop, after the client's earlier requests.
+
+    The time spent waiting for the loop and the client's earlier requests is
+    recorded as app_queue_wait_seconds, the request itself as an app_request
+    span labelled with its kind.
+    """
+    submitted = time.perf_counter()
+
+    async def run():
+        async with sessions.lock(sid):
+            observe("app_queue_wait_seconds", time.perf_counter() - submitted, kind=kind)
+            with span("app_request", kind=kind) as request_span:
+                try:
+                    await coro
+                except Exception as e:
+                    request_span.fail()
+                    logger.error("Error handling request for %s: %s", sid, e)
+                    send(sid, 'message', {'role': 'assistant', 'content': f"Error: {str(e)}"})
+
+    return asyncio.run_coroutine_threadsafe(run(), loop)
+
+
+class ClientEvents:
+    """
+    Forwards chatbot events to one Socket.IO client.
+
+    Streamed text goes out as assistant_delta and is closed with
+    assistant_done; tool progress goes out as tool_output; resources,
+    prompt listings, final answers and errors are sent as messages.
+    """
+
+    def __init__(self, sid):
+        self.sid = sid
+        self.streamed_text = False
+
+    def __call__(self, event):
+        kind = event["type"]
+        if kind == "delta":
+            self.streamed_text = True
+            send(self.sid, 'assistant_delta', {'content': event["content"]})
+        elif kind == "tool_call":
+            send(self.sid, 'tool_output', {'content': f"Calling tool: {event['name']}"})
+        elif kind == "tool_result":
+            send(self.sid, 'tool_output', {'content': f"Tool result ({event['name']}): {event['content'][:200]}"})
+        elif kind == "prompt":
+            send(self.sid, 'tool_output', {'content': f"Executing prompt: {event['name']}"})
+        elif kind == "assistant":
+            if self.streamed_text:
+                # The client already rendered the deltas; send the final text
+                # so it can replace the streamed draft with formatted markdown
+                send(self.sid, 'assistant_done', {'content': event["content"] or ""})
+                self.streamed_text = False
+            elif event["content"]:
+                send(self.sid, 'message', {'role': 'assistant', 'content': event["content"]})
+        elif kind in ("resource", "prompts", "error"):
+            send(self.sid, 'message', {'role': 'assistant', 'content': event["content"]})
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
-# Helper function to run async functions and handle errors
-def async_task(f):
-    @functools.wraps(f)
-    def wrapped(*args, **kwargs):
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Latency and token metrics of the app, the chatbot and its MCP servers (Prometheus format)."""
+    text = metrics.render()
+    if chatbot is not None:
         try:
-            return loop.run_until_complete(f(*args, **kwargs))
+            text = asyncio.run_coroutine_threadsafe(chatbot.metrics_text(), loop).result(timeout=10)
         except Exception as e:
-            logger.error(f"Error in async task: {e}")
-            return {"error": str(e)}
-    return wrapped
+            logger.warning("Error collecting server metrics: %s", e)
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
 
 @socketio.on('connect')
 def handle_connect():
-    logger.info("Client connected")
-    initialize_chatbot()
+    logger.info("Client connected: %s", request.sid)
+    sessions.get(request.sid)
     
     # Convert prompt arguments to JSON-serializable format
     serializable_prompts = []
@@ -94,14 +210,24 @@ def handle_connect():
         'prompts': serializable_prompts
     })
 
+
+async def clear_history(sid, conversation):
+    conversation.message_history = []
+    send(sid, 'message', {'role': 'assistant', 'content': "Conversation history cleared."})
+
+
 @socketio.on('message')
 def handle_message(data):
-    logger.info(f"Received message: {data}")
+    logger.info("Received message from %s", request.sid)
+    log_payload("Message", data)
     query = data.get('message', '').strip()
     
     if not query:
         return
     
+    sid = request.sid
+    conversation = sessions.get(sid)
+    
     # Emit the user message back to confirm receipt
     emit('message', {'role': 'user', 'content': query})
     
@@ -113,61 +239,14 @@ def handle_message(data):
             resource_uri = "papers://folders"
         else:
             resource_uri = f"papers://{topic}"
-        
-        # Define a function to handle the resource request
-        def handle_resource_request():
-            # Use a synchronous approach to capture output
-            import io
-            import sys
-            from contextlib import redirect_stdout
-            
-            # Capture stdout
-            f = io.StringIO()
-            with redirect_stdout(f):
-                # Run the async function in the event loop
-                loop.run_until_complete(chatbot.get_resource(resource_uri))
-            
-            # Get the captured output
-            output = f.getvalue()
-            return output
-        
-        try:
-            # Get the resource content
-            content = handle_resource_request()
-            emit('message', {'role': 'assistant', 'content': content})
-        except Exception as e:
-            logger.error(f"Error getting resource: {e}")
-            emit('message', {'role': 'assistant', 'content': f"Error: {str(e)}"})
+        submit(sid, conversation.get_resource(resource_uri, on_event=ClientEvents(sid)), kind="resource")
         
     elif query.startswith('/'):
         parts = query.split()
         command = parts[0].lower()
         
         if command == '/prompts':
-            # Define a function to handle the prompts request
-            def handle_prompts_request():
-                # Use a synchronous approach to capture output
-                import io
-                import sys
-                from contextlib import redirect_stdout
-                
-                # Capture stdout
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    # Run the async function in the event loop
-                    loop.run_until_complete(chatbot.list_prompts())
-                
-                # Get the captured output
-                output = f.getvalue()
-                return output
-            
-            try:
-                # Get the prompts content
-                content = handle_prompts_request()
-                emit('message', {'role': 'assistant', 'content': content})
-            except Exception as e:
-                logger.error(f"Error listing prompts: {e}")
-                emit('message', {'role': 'assistant', 'content': f"Error: {str(e)}"})
+            submit(sid, conversation.list_prompts(on_event=ClientEvents(sid)), kind="prompts")
             
         elif command == '/prompt':
             if len(parts) < 2:
@@ -183,92 +262,25 @@ def handle_message(data):
                     key, value = arg.split('=', 1)
                     args[key] = value
             
-            # Define a function to handle the prompt execution
-            def handle_prompt_execution():
-                # Use a synchronous approach to capture output
-                import io
-                import sys
-                from contextlib import redirect_stdout
-                
-                # Capture stdout
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    # Run the async function in the event loop
-                    loop.run_until_complete(chatbot.execute_prompt(prompt_name, args))
-                
-                # Get the captured output
-                output = f.getvalue()
-                return output
-            
-            try:
-                # Execute the prompt
-                content = handle_prompt_execution()
-                emit('message', {'role': 'assistant', 'content': content})
-            except Exception as e:
-                logger.error(f"Error executing prompt: {e}")
-                emit('message', {'role': 'assistant', 'content': f"Error: {str(e)}"})
+            submit(sid, conversation.execute_prompt(prompt_name, args, stream=True, on_event=ClientEvents(sid)), kind="prompt")
             
         elif command == '/clear':
-            chatbot.message_history = []
-            emit('message', {'role': 'assistant', 'content': "Conversation history cleared."})
+            # Queued behind any running query so it does not clear mid-turn
+            submit(sid, clear_history(sid, conversation), kind="clear")
             
         else:
             emit('message', {'role': 'assistant', 'content': f"Unknown command: {command}"})
     
     else:
-        # Regular query
-        def handle_query():
-            # Use a synchronous approach to capture output
-            import io
-            import sys
-            from contextlib import redirect_stdout
-            
-            # Capture stdout
-            f = io.StringIO()
-            with redirect_stdout(f):
-                # Run the async function in the event loop
-                loop.run_until_complete(chatbot.process_query(query))
-            
-            # Get the captured output
-            output = f.getvalue()
-            
-            # Extract the assistant's response from the message history
-            assistant_response = None
-            if chatbot.message_history:
-                for msg in reversed(chatbot.message_history):
-                    if msg.get('role') == 'assistant' and msg.get('content'):
-                        assistant_response = msg.get('content')
-                        break
-            
-            # Get tool outputs
-            tool_outputs = "\n".join([line for line in output.split('\n') if line.startswith("Tool result:") or line.startswith("Calling tool:")])
-            
-            return {
-                "assistant_response": assistant_response,
-                "tool_outputs": tool_outputs,
-                "raw_output": output
-            }
-        
-        try:
-            # Process the query
-            result = handle_query()
-            
-            if result.get("assistant_response"):
-                emit('message', {'role': 'assistant', 'content': result["assistant_response"]})
-            
-            if result.get("tool_outputs"):
-                emit('tool_output', {'content': result["tool_outputs"]})
-                
-            # If no assistant response but we have output, send that
-            if not result.get("assistant_response") and result.get("raw_output"):
-                emit('message', {'role': 'assistant', 'content': result["raw_output"]})
-        except Exception as e:
-            logger.error(f"Error processing query: {e}")
-            emit('message', {'role': 'assistant', 'content': f"Error: {str(e)}"})
+        # Regular query, streamed to the client as it is generated
+        submit(sid, conversation.process_query(query, stream=True, on_event=ClientEvents(sid)))
+
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    logger.info("Client disconnected")
+    logger.info("Client disconnected: %s", request.sid)
+    sessions.drop(request.sid)
+
 
 if __name__ == '__main__':
     # Initialize the chatbot before starting the server
@@ -0,0 +1,238 @@
+"""
+arXiv search helpers for the research server.
+
+All searches go through one process-wide arxiv client guarded by a token
+bucket, so concurrent tool calls respect arXiv's rate limit together.
+Identical queries that are already in flight are coalesced into a single
+upstream request, and failures are retried with exponential backoff.
+
+Query results are cached by (normalized query, max_results, sort order) in a
+TTL + LRU cache, optionally persisted to disk.
+
+Configuration (environment variables):
+    ARXIV_CACHE_TTL, ARXIV_CACHE_SIZE, ARXIV_CACHE_FILE: query cache settings
+    ARXIV_RATE, ARXIV_BURST: requests per second and burst size
+    ARXIV_MAX_RETRIES, ARXIV_BACKOFF: retry count and initial backoff (seconds)
+    ARXIV_PAGE_SIZE: results requested per arXiv API page
+    ARXIV_API_URL: query endpoint to use instead of arXiv's, e.g. bench/arxiv_stub.py
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Tuple
+
+import arxiv
+
+from ttl_cache import TTLCache
+
+SORT_CRITERIA = {
+    "relevance": arxiv.SortCriterion.Relevance,
+    "submitted": arxiv.SortCriterion.SubmittedDate,
+    "updated": arxiv.SortCriterion.LastUpdatedDate,
+}
+
+MAX_RETRIES = int(os.environ.get("ARXIV_MAX_RETRIES", "3"))
+BACKOFF_SECONDS = float(os.environ.get("ARXIV_BACKOFF", "1.0"))
+MAX_BACKOFF_SECONDS = 30.0
+
+# Errors worth retrying: HTTP errors (including 429/503 from arXiv), pages
+# that come back empty under load, and network failures
+RETRYABLE_ERRORS = (arxiv.HTTPError, arxiv.UnexpectedEmptyPageError, OSError)
+
+query_cache = TTLCache(
+    maxsize=int(os.environ.get("ARXIV_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("ARXIV_CACHE_TTL", "3600")),
+    persist_path=os.environ.get("ARXIV_CACHE_FILE") or None,
+)
+
+# Counters for tuning the client, exposed alongside the cache stats
+client_stats = {
+    'upstream_requests': 0,
+    'coalesced': 0,
+    'retries': 0,
+    'failures': 0,
+}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is available.
+
+    Callers reserve a token up front and then sleep outside the lock, so
+    waiting threads are released in arrival order at the configured rate.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+# arXiv asks for no more than one request every three seconds
+rate_limiter = TokenBucket(
+    rate=float(os.environ.get("ARXIV_RATE", str(1 / 3))),
+    capacity=float(os.environ.get("ARXIV_BURST", "1")),
+)
+
+
+class RateLimitedClient(arxiv.Client):
+    """arxiv.Client that takes a token from the shared bucket for every page request."""
+
+    def _parse_feed(self, *args, **kwargs):
+        rate_limiter.acquire()
+        client_stats['upstream_requests'] += 1
+        return super()._parse_feed(*args, **kwargs)
+
+
+# One client for the whole process. Pacing and retries are handled by the
+# token bucket and search_arxiv, so the client's own delay and retries are off.
+client = RateLimitedClient(
+    page_size=int(os.environ.get("ARXIV_PAGE_SIZE", "100")),
+    delay_seconds=0,
+    num_retries=0,
+)
+if os.environ.get("ARXIV_API_URL"):
+    client.query_url_format = os.environ["ARXIV_API_URL"] + "?{}"
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def paper_to_info(paper: arxiv.Result) -> dict:
+    """Convert an arxiv result into the paper info stored by the research server."""
+    return {
+        'title': paper.title,
+        'authors': [author.name for author in paper.authors],
+        'summary': paper.summary,
+        'pdf_url': paper.pdf_url,
+        'published': str(paper.published.date())
+    }
+
+
+def _with_retries(func, *args):
+    """Call func(*args), retrying retryable arXiv errors with backoff."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return func(*args)
+        except RETRYABLE_ERRORS:
+            if attempt == MAX_RETRIES:
+                client_stats['failures'] += 1
+                raise
+            client_stats['retries'] += 1
+            # Exponential backoff with full jitter so retries from many
+            # sessions do not hit arXiv in lockstep
+            backoff = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** attempt)
+            time.sleep(random.uniform(0, backoff))
+
+
+def _fetch_with_retries(query: str, max_results: int, sort_by: str) -> Dict[str, dict]:
+    search = arxiv.Search(
+        query = query,
+        max_results = max_results,
+        sort_by = SORT_CRITERIA[sort_by]
+    )
+    return _with_retries(
+        lambda: {paper.get_short_id(): paper_to_info(paper) for paper in client.results(search)}
+    )
+
+
+def fetch_page(query: str, start: int, page_size: int, sort_by: str = "submitted") -> Tuple[int, Dict[str, dict]]:
+    """
+    Fetch one page of an arXiv result set, bypassing the query cache.
+
+    Pages are independent requests, so several can be fetched in parallel;
+    the shared token bucket still paces them. Empty pages past the first are
+    treated as transient arXiv errors and retried.
+
+    Args:
+        query: The arXiv search query
+        start: Offset of the first result on the page
+        page_size: Number of results on the page
+        sort_by: One of "relevance", "submitted" or "updated". Date orders
+            are ascending, so with "submitted" new papers are appended at the
+            end and earlier pages stay stable while harvesting
+
+    Returns:
+        (total results arXiv reports for the query, papers on this page)
+    """
+    # arXiv sorts newest first by default, which would shift every page
+    # down whenever a paper is submitted
+    sort_order = arxiv.SortOrder.Descending if sort_by == "relevance" else arxiv.SortOrder.Ascending
+    search = arxiv.Search(query=query, sort_by=SORT_CRITERIA[sort_by], sort_order=sort_order)
+    url = client._format_url(search, start, page_size)
+
+    def fetch():
+        feed = client._parse_feed(url, first_page=start == 0)
+        total = int(feed.feed.get("opensearch_totalresults", 0)) if feed.entries else 0
+        papers = {}
+        for entry in feed.entries:
+            try:
+                paper = arxiv.Result._from_feed_entry(entry)
+            except arxiv.Result.MissingFieldError:
+                continue
+            papers[paper.get_short_id()] = paper_to_info(paper)
+        return total, papers
+
+    return _with_retries(fetch)
+
+
+def search_arxiv(query: str, max_results: int = 5, sort_by: str = "relevance") -> Dict[str, dict]:
+    """
+    Search arXiv, answering repeated queries from the result cache.
+
+    Concurrent calls for the same query share one upstream request.
+
+    Args:
+        query: The arXiv search query
+        max_results: Maximum number of results to retrieve
+        sort_by: One of "relevance", "submitted" or "updated"
+
+    Returns:
+        Dict mapping paper IDs to paper info, in result order
+    """
+    key = (normalize_query(query), max_results, sort_by)
+    papers = query_cache.get(key)
+    if papers is not None:
+        return papers
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+        else:
+            client_stats['coalesced'] += 1
+
+    if not leader:
+        return future.result()
+
+    try:
+        papers = _fetch_with_retries(query, max_results, sort_by)
+        query_cache.set(key, papers)
+        future.set_result(papers)
+        return papers
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
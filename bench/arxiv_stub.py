@@ -0,0 +1,115 @@
+"""
+Local stand-in for the arXiv query API.
+
+Answers /api/query with an Atom feed of deterministic synthetic papers, so
+search_papers and harvest.py can be exercised without network access or
+rate limits:
+
+    python bench/arxiv_stub.py --port 8002 --total 5000
+    ARXIV_API_URL=http://127.0.0.1:8002/api/query ARXIV_RATE=1000 python research_server.py
+
+Every query reports the same number of total results; paper IDs are derived
+from the query and offset, so different queries return different papers.
+"""
+
+import argparse
+import hashlib
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+FEED_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" xmlns:arxiv="http://arxiv.org/schemas/atom">
+  <title>arXiv Query: {query}</title>
+  <id>http://arxiv.org/api/stub</id>
+  <updated>2024-01-01T00:00:00Z</updated>
+  <opensearch:totalResults>{total}</opensearch:totalResults>
+  <opensearch:startIndex>{start}</opensearch:startIndex>
+  <opensearch:itemsPerPage>{count}</opensearch:itemsPerPage>
+"""
+
+ENTRY = """  <entry>
+    <id>http://arxiv.org/abs/{paper_id}</id>
+    <updated>2024-01-{day:02d}T00:00:00Z</updated>
+    <published>2024-01-{day:02d}T00:00:00Z</published>
+    <title>{title}</title>
+    <summary>{summary}</summary>
+    <author><name>Author {a}</name></author>
+    <author><name>Author {b}</name></author>
+    <link href="http://arxiv.org/abs/{paper_id}" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/{paper_id}" rel="related" type="application/pdf"/>
+    <arxiv:primary_category term="cs.CL" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="cs.CL" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>
+"""
+
+
+def paper_id(query: str, index: int) -> str:
+    """Stable arXiv-style ID, unique per query for the first 100000 results."""
+    digest = int(hashlib.sha1(query.encode()).hexdigest()[:8], 16)
+    return f"{2400 + digest % 100}.{(digest + index) % 100000:05d}v1"
+
+
+def render_feed(query: str, start: int, max_results: int, total: int) -> str:
+    count = max(0, min(max_results, total - start))
+    parts = [FEED_HEADER.format(query=escape(query), total=total, start=start, count=count)]
+    for index in range(start, start + count):
+        parts.append(ENTRY.format(
+            paper_id=paper_id(query, index),
+            day=index % 28 + 1,
+            title=escape(f"Synthetic paper {index} on {query}"),
+            summary=escape(f"Result {index} for the query {query}. " * 8),
+            a=index % 97,
+            b=index % 89
+        ))
+    parts.append("</feed>\n")
+    return "".join(parts)
+
+
+class ArxivStubHandler(BaseHTTPRequestHandler):
+    total = 1000
+    delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        query = params.get("search_query", [""])[0]
+        start = int(params.get("start", ["0"])[0])
+        max_results = int(params.get("max_results", ["10"])[0])
+        time.sleep(self.delay)
+
+        body = render_feed(query, start, max_results, self.total).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/atom+xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8002, total: int = 1000,
+                delay: float = 0.0) -> ThreadingHTTPServer:
+    """Create (but do not start) a stub server; port 0 picks a free port."""
+    handler = type("ConfiguredArxivStubHandler", (ArxivStubHandler,), {"total": total, "delay": delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local arXiv API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--total", type=int, default=1000, help="Total results reported for every query")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before answering")
+    cli_args = parser.parse_args()
+
+    server = make_server(cli_args.host, cli_args.port, cli_args.total, cli_args.delay)
+    print(f"arXiv stub listening on http://{cli_args.host}:{server.server_address[1]}/api/query")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,392 @@
+"""
+End-to-end benchmarks against local stand-ins for arXiv and OpenAI.
+
+The real research_server.py, MCP_ChatBot and app.py are exercised, but arXiv
+is replaced by bench/arxiv_stub.py and the OpenAI API by stub_llm_server.py
+with a scripted conversation (search_papers, then extract_info for every
+result, then an answer). Everything runs in a temporary directory, so the
+repository's papers/ folder is never touched.
+
+    python bench/run_bench.py
+    python bench/run_bench.py --scenarios tools --sizes 100 1000 10000 --store sqlite
+    python bench/run_bench.py --output after.json --compare before.json
+
+Scenarios:
+    tools: latency of each research tool and resource over stdio, per store size
+    turns: process_query latency of the scripted turn
+    socketio: query throughput of app.py with several concurrent Socket.IO clients
+
+Results are written as JSON (default bench/results/bench-<timestamp>.json).
+Latencies are in milliseconds.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import arxiv_stub  # noqa: E402
+import stub_llm_server  # noqa: E402
+
+RESEARCH_SERVER = os.path.join(ROOT, "research_server.py")
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+PAPER_ID_PATTERN = re.compile(r"\d{4}\.\d{5}v\d+")
+
+
+def summarize(samples: List[float]) -> dict:
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+
+async def timed(samples: List[float], awaitable):
+    start = time.perf_counter()
+    result = await awaitable
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def scripted_reply(request: dict):
+    """
+    Scripted model: search for the user's question, look up every paper it
+    finds in parallel, then answer.
+    """
+    messages = request.get("messages", [])
+    last = messages[-1] if messages else {}
+    if last.get("role") == "user":
+        return {"role": "assistant", "content": None, "tool_calls": [{
+            "id": "call_search",
+            "type": "function",
+            "function": {"name": "search_papers", "arguments": json.dumps({"topic": last["content"], "max_results": 5})}
+        }]}
+    if last.get("role") == "tool" and last.get("name") == "search_papers":
+        paper_ids = PAPER_ID_PATTERN.findall(str(last.get("content")))
+        return {"role": "assistant", "content": None, "tool_calls": [{
+            "id": f"call_extract_{index}",
+            "type": "function",
+            "function": {"name": "extract_info", "arguments": json.dumps({"paper_id": paper_id})}
+        } for index, paper_id in enumerate(dict.fromkeys(paper_ids))]}
+    return "Here is a summary of the papers I found on this topic, with their key findings."
+
+
+def start_thread_server(server) -> int:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def synthetic_papers(topic: str, count: int) -> Dict[str, dict]:
+    return {
+        arxiv_stub.paper_id(topic, index): {
+            'title': f"Stored paper {index} on {topic}",
+            'authors': [f"Author {index % 97}", f"Author {index % 89}"],
+            'summary': f"Stored result {index} about {topic}. " * 8,
+            'pdf_url': f"http://arxiv.org/pdf/{arxiv_stub.paper_id(topic, index)}",
+            'published': f"2024-01-{index % 28 + 1:02d}"
+        }
+        for index in range(count)
+    }
+
+
+def populate_store(env: dict, size: int, topics: int = 10) -> dict:
+    """Fill a store with size papers spread over topics; returns timing info."""
+    from paper_store import JsonPaperStore, SqlitePaperStore
+
+    if env["PAPER_STORE"] == "sqlite":
+        store = SqlitePaperStore(env["PAPER_DB"])
+    else:
+        store = JsonPaperStore(env["PAPER_DIR"])
+    start = time.perf_counter()
+    per_topic = max(1, size // topics)
+    for index in range(topics):
+        store.add_papers(f"topic_{index}", synthetic_papers(f"topic_{index}", per_topic))
+    elapsed = time.perf_counter() - start
+    store.close()
+    return {'papers': per_topic * topics, 'seconds': round(elapsed, 3),
+            'papers_per_second': round(per_topic * topics / elapsed, 1) if elapsed else None}
+
+
+async def bench_tools(workdir: str, env: dict, sizes: List[int], iterations: int) -> dict:
+    from supervisor import ServerHandle
+
+    results = {}
+    for size in sizes:
+        store_dir = os.path.join(workdir, f"store_{size}")
+        size_env = {**env, "PAPER_DIR": store_dir, "PAPER_DB": os.path.join(store_dir, "papers.db")}
+        os.makedirs(store_dir, exist_ok=True)
+        populate = populate_store(size_env, size)
+        paper_ids = list(synthetic_papers("topic_0", max(1, size // 10)))
+
+        start = time.perf_counter()
+        handle = await ServerHandle("research", {
+            "command": sys.executable, "args": [RESEARCH_SERVER], "env": size_env, "cwd": workdir
+        }).start(timeout=120)
+        startup = time.perf_counter() - start
+        session = handle.session
+
+        samples = {name: [] for name in (
+            "search_papers", "extract_info", "extract_info_many", "search_local",
+            "resource_folders", "resource_topic"
+        )}
+        try:
+            for index in range(iterations):
+                await timed(samples["search_papers"], session.call_tool(
+                    "search_papers", {"topic": f"bench query {size} {index}", "max_results": 5}))
+                await timed(samples["extract_info"], session.call_tool(
+                    "extract_info", {"paper_id": random.choice(paper_ids)}))
+                await timed(samples["extract_info_many"], session.call_tool(
+                    "extract_info_many", {"paper_ids": random.sample(paper_ids, min(10, len(paper_ids)))}))
+                await timed(samples["search_local"], session.call_tool(
+                    "search_local", {"query": f"result {index}", "max_results": 10}))
+                await timed(samples["resource_folders"], session.read_resource("papers://folders"))
+                await timed(samples["resource_topic"], session.read_resource("papers://topic_0"))
+        finally:
+            await handle.stop()
+
+        results[str(size)] = {
+            'populate': populate,
+            'server_startup_ms': round(startup * 1000, 1),
+            **{name: summarize(values) for name, values in samples.items()}
+        }
+        print(f"tools, {size} papers: " + ", ".join(
+            f"{name} p50 {results[str(size)][name]['p50_ms']}ms" for name in samples))
+    return results
+
+
+def write_server_config(workdir: str, env: dict) -> None:
+    config = {"mcpServers": {"research": {
+        "command": sys.executable, "args": [RESEARCH_SERVER], "env": env, "cwd": workdir
+    }}}
+    with open(os.path.join(workdir, "server_config.json"), "w") as config_file:
+        json.dump(config, config_file, indent=2)
+
+
+async def bench_turns(workdir: str, iterations: int) -> dict:
+    from mcp_chatbot import MCP_ChatBot
+
+    chatbot = MCP_ChatBot()
+    start = time.perf_counter()
+    await chatbot.connect_to_servers()
+    startup = time.perf_counter() - start
+
+    samples = []
+    try:
+        for index in range(iterations):
+            conversation = chatbot.new_conversation()
+            await timed(samples, conversation.process_query(
+                f"turn benchmark {index}", stream=True, on_event=lambda event: None))
+    finally:
+        await chatbot.cleanup()
+
+    result = {'connect_ms': round(startup * 1000, 1), 'turn': summarize(samples)}
+    print(f"turns: p50 {result['turn']['p50_ms']}ms, p95 {result['turn']['p95_ms']}ms")
+    return result
+
+
+def bench_socketio(workdir: str, env: dict, clients: int, messages: int) -> dict:
+    import socketio
+
+    port = free_port()
+    code = (
+        "import app; app.initialize_chatbot(); "
+        f"app.socketio.run(app.app, host='127.0.0.1', port={port}, allow_unsafe_werkzeug=True)"
+    )
+    log_path = os.path.join(workdir, "app.log")
+    with open(log_path, "w") as log_file:
+        process = subprocess.Popen(
+            [sys.executable, "-c", code], cwd=workdir, stdout=log_file, stderr=log_file,
+            env={**os.environ, **env, "PYTHONPATH": ROOT}
+        )
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or process.poll() is not None:
+                    raise RuntimeError(f"app.py did not start, see {log_path}")
+                time.sleep(0.2)
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def run_client(client_index: int) -> None:
+            client = socketio.Client()
+            answered = threading.Event()
+
+            @client.on('assistant_done')
+            def on_done(data):
+                answered.set()
+
+            @client.on('message')
+            def on_message(data):
+                if data.get('role') == 'assistant':
+                    answered.set()
+
+            try:
+                client.connect(f"http://127.0.0.1:{port}", wait_timeout=30)
+                for index in range(messages):
+                    answered.clear()
+                    start = time.perf_counter()
+                    client.emit('message', {'message': f"socket benchmark {client_index} {index}"})
+                    if not answered.wait(timeout=60):
+                        raise TimeoutError("no answer within 60s")
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            finally:
+                client.disconnect()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run_client, args=(index,)) for index in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    result = {
+        'clients': clients,
+        'messages_per_client': messages,
+        'seconds': round(elapsed, 3),
+        'queries_per_second': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'errors': errors,
+        'latency': summarize(latencies)
+    }
+    print(f"socketio: {result['queries_per_second']} queries/s with {clients} clients, "
+          f"p50 {result['latency'].get('p50_ms')}ms, {len(errors)} errors")
+    return result
+
+
+def compare(current: dict, baseline_path: str) -> None:
+    """Print the change in p50/mean latency against an earlier results file."""
+    with open(baseline_path, "r") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    def walk(new, old, path):
+        for key, value in new.items():
+            if isinstance(value, dict) and isinstance(old.get(key), dict):
+                walk(value, old[key], path + [key])
+            elif key in ('p50_ms', 'mean_ms', 'queries_per_second') and isinstance(old.get(key), (int, float)):
+                change = (value - old[key]) / old[key] * 100 if old[key] else 0.0
+                print(f"{'/'.join(path + [key])}: {old[key]} -> {value} ({change:+.1f}%)")
+
+    walk({k: v for k, v in current.items() if k != 'meta'}, baseline, [])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks with local stub services")
+    parser.add_argument("--scenarios", nargs="+", choices=["tools", "turns", "socketio"],
+                        default=["tools", "turns", "socketio"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 5000],
+                        help="Store sizes (papers) for the tools scenario")
+    parser.add_argument("--store", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=5, help="Queries per Socket.IO client")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Seconds the LLM stub waits per reply")
+    parser.add_argument("--arxiv-delay", type=float, default=0.0, help="Seconds the arXiv stub waits per page")
+    parser.add_argument("--output", help="Results file (default: bench/results/bench-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    cli_args = parser.parse_args()
+
+    arxiv_port = start_thread_server(arxiv_stub.make_server(port=0, delay=cli_args.arxiv_delay))
+    llm_port = start_thread_server(stub_llm_server.make_server(
+        port=0, delay=cli_args.llm_delay, reply_builder=scripted_reply))
+
+    workdir = tempfile.mkdtemp(prefix="mcp-bench-")
+    paper_dir = os.path.join(workdir, "papers")
+    env = {
+        "ARXIV_API_URL": f"http://127.0.0.1:{arxiv_port}/api/query",
+        "ARXIV_RATE": "1000",
+        "ARXIV_BURST": "1000",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "OPENAI_API_KEY": "bench",
+        "MCP_HEALTH_INTERVAL": "0",
+        "PAPER_STORE": cli_args.store,
+        "PAPER_DIR": paper_dir,
+        "PAPER_DB": os.path.join(paper_dir, "papers.db"),
+        "TOOL_SPILL_DIR": os.path.join(workdir, "spill"),
+    }
+    os.environ.update(env)
+    write_server_config(workdir, env)
+
+    results = {'meta': {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': vars(cli_args)
+    }}
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        if "tools" in cli_args.scenarios:
+            results['tools'] = asyncio.run(bench_tools(workdir, env, cli_args.sizes, cli_args.iterations))
+        if "turns" in cli_args.scenarios:
+            results['turns'] = asyncio.run(bench_turns(workdir, cli_args.iterations))
+        if "socketio" in cli_args.scenarios:
+            results['socketio'] = bench_socketio(workdir, env, cli_args.clients, cli_args.messages)
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = cli_args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results saved to {output}")
+
+    if cli_args.compare:
+        compare(results, cli_args.compare)
+
+
+if __name__ == "__main__":
+    main()
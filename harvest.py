@@ -0,0 +1,262 @@
+"""
+Bulk harvesting of arXiv results into the paper store.
+
+search_papers fetches a handful of papers per call. To build a corpus for a
+whole field, harvest pages through the complete result set of a query with
+several workers, writes the papers to the same store the research server
+uses, in batches, and records finished pages in a checkpoint so an
+interrupted run can be resumed:
+
+    python harvest.py "cat:cs.CL" --topic computation_and_language --max-results 20000
+    python harvest.py "cat:cs.CL" --topic computation_and_language --max-results 20000  # resumes
+
+All requests go through the shared arXiv client and its token bucket
+(ARXIV_RATE, ARXIV_BURST), so workers overlap request latency but never
+exceed the configured rate.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+from arxiv_client import fetch_page
+from paper_store import PAPER_DIR, PaperStore, get_store
+
+# arXiv does not serve results past this offset for a single query
+ARXIV_MAX_OFFSET = 30000
+
+
+class Checkpoint:
+    """
+    Progress of one harvest, saved as JSON after every batch write.
+
+    Only pages whose papers have been written to the store are recorded, so a
+    resumed harvest never skips unsaved papers.
+    """
+
+    def __init__(self, path: str, query: str, topic: str, page_size: int, sort_by: str):
+        self.path = path
+        self.state = {
+            'query': query,
+            'topic': topic,
+            'page_size': page_size,
+            'sort_by': sort_by,
+            'total': None,
+            'done_pages': [],
+            'papers_saved': 0
+        }
+
+    def load(self) -> bool:
+        """Load saved progress if it belongs to the same harvest; return whether it did."""
+        try:
+            with open(self.path, "r") as checkpoint_file:
+                saved = json.load(checkpoint_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        same_harvest = all(saved.get(key) == self.state[key] for key in ('query', 'topic', 'page_size', 'sort_by'))
+        if same_harvest:
+            self.state.update(saved)
+        return same_harvest
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as checkpoint_file:
+            json.dump(self.state, checkpoint_file, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class Harvester:
+    """Fetches pages in parallel and writes their papers to the store in batches."""
+
+    def __init__(self, store: PaperStore, checkpoint: Checkpoint, max_results: int,
+                 workers: int = 4, batch_size: int = 500, report=print):
+        self.store = store
+        self.checkpoint = checkpoint
+        self.max_results = min(max_results, ARXIV_MAX_OFFSET)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.report = report
+        self.stop = threading.Event()
+        self._pending: Dict[str, dict] = {}
+        self._pending_pages = []
+        self._fetched = 0
+        self._started = None
+
+    @property
+    def query(self) -> str:
+        return self.checkpoint.state['query']
+
+    @property
+    def page_size(self) -> int:
+        return self.checkpoint.state['page_size']
+
+    def _fetch(self, start: int):
+        if self.stop.is_set():
+            return start, 0, {}
+        total, papers = fetch_page(self.query, start, self.page_size, self.checkpoint.state['sort_by'])
+        return start, total, papers
+
+    def _flush(self) -> None:
+        """Write buffered papers, then record their pages as done."""
+        if self._pending:
+            self.store.add_papers(self.checkpoint.state['topic'], self._pending)
+        self.checkpoint.state['papers_saved'] += len(self._pending)
+        self.checkpoint.state['done_pages'] = sorted(set(self.checkpoint.state['done_pages']) | set(self._pending_pages))
+        self.checkpoint.save()
+        self._pending = {}
+        self._pending_pages = []
+
+    def _progress(self, pages_total: int) -> None:
+        elapsed = time.perf_counter() - self._started
+        state = self.checkpoint.state
+        done = len(state['done_pages']) + len(self._pending_pages)
+        rate = self._fetched / elapsed if elapsed else 0.0
+        self.report(
+            f"{done}/{pages_total} pages, {state['papers_saved']} papers saved, "
+            f"{rate:.1f} papers/s"
+        )
+
+    def _accept(self, start: int, papers: Dict[str, dict], pages_total: int) -> None:
+        self._pending.update(papers)
+        self._pending_pages.append(start)
+        self._fetched += len(papers)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+            self._progress(pages_total)
+
+    def run(self) -> dict:
+        """Harvest all remaining pages; returns a summary of the run."""
+        self._started = time.perf_counter()
+        state = self.checkpoint.state
+
+        if state['total'] is None:
+            # The first page tells us how many results there are
+            start, total, papers = self._fetch(0)
+            state['total'] = total
+            self.report(f"arXiv reports {total} results for {self.query!r}")
+            self._accept(start, papers, 1)
+
+        limit = min(state['total'], self.max_results)
+        offsets = range(0, limit, self.page_size)
+        if state['done_pages']:
+            self.report(f"Resuming: {len(state['done_pages'])} of {len(offsets)} pages already harvested")
+        done = set(state['done_pages']) | set(self._pending_pages)
+        remaining = [offset for offset in offsets if offset not in done]
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="harvest")
+        try:
+            # Keep a few pages in flight per worker rather than queueing them all
+            queue = iter(remaining)
+            in_flight = set()
+            for offset in queue:
+                in_flight.add(executor.submit(self._fetch, offset))
+                if len(in_flight) >= self.workers * 2:
+                    break
+            while in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, _, papers = future.result()
+                    if not self.stop.is_set():
+                        self._accept(start, papers, len(offsets))
+                    next_offset = next(queue, None)
+                    if next_offset is not None and not self.stop.is_set():
+                        in_flight.add(executor.submit(self._fetch, next_offset))
+        except KeyboardInterrupt:
+            self.stop.set()
+            self.report("Interrupted, saving progress...")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._flush()
+
+        elapsed = time.perf_counter() - self._started
+        summary = {
+            'query': self.query,
+            'topic': state['topic'],
+            'total_results': state['total'],
+            'pages_done': len(state['done_pages']),
+            'pages_total': len(offsets),
+            'papers_saved': state['papers_saved'],
+            'papers_fetched_this_run': self._fetched,
+            'seconds': round(elapsed, 2),
+            'papers_per_second': round(self._fetched / elapsed, 2) if elapsed else 0.0,
+            'complete': len(state['done_pages']) >= len(offsets)
+        }
+        self.report(
+            f"Harvested {self._fetched} papers in {elapsed:.1f}s "
+            f"({summary['papers_per_second']} papers/s); "
+            f"{summary['pages_done']}/{summary['pages_total']} pages done"
+        )
+        return summary
+
+
+def default_checkpoint_path(topic: str) -> str:
+    return os.path.join(os.environ.get("PAPER_DIR", PAPER_DIR), f".harvest_{topic}.json")
+
+
+def harvest(query: str, topic: Optional[str] = None, max_results: int = 10000, page_size: int = 200,
+            workers: int = 4, batch_size: int = 500, sort_by: str = "submitted",
+            checkpoint_path: Optional[str] = None, store: Optional[PaperStore] = None,
+            restart: bool = False, report=print) -> dict:
+    """
+    Harvest up to max_results papers for an arXiv query into the paper store.
+
+    Args:
+        query: The arXiv search query, e.g. "cat:cs.CL" or "all:transformers"
+        topic: Topic to store the papers under (default: derived from the query)
+        max_results: Maximum number of results to harvest (arXiv serves at most 30000)
+        page_size: Results per arXiv request
+        workers: Pages fetched in parallel
+        batch_size: Papers buffered before each write to the store
+        sort_by: Result order; "submitted" keeps pages stable while harvesting
+        checkpoint_path: Where progress is saved (default: papers/.harvest_<topic>.json)
+        store: Paper store to write to (default: the one selected by PAPER_STORE)
+        restart: Ignore any saved progress and start from the first page
+        report: Callable receiving progress lines
+
+    Returns:
+        Summary of the run, including throughput in papers per second
+    """
+    topic_dir = (topic or query).lower().replace(" ", "_")
+    checkpoint = Checkpoint(checkpoint_path or default_checkpoint_path(topic_dir),
+                            query, topic_dir, page_size, sort_by)
+    if not restart:
+        checkpoint.load()
+    store = store or get_store()
+    try:
+        return Harvester(store, checkpoint, max_results, workers, batch_size, report).run()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Harvest a large arXiv result set into the paper store")
+    parser.add_argument("query", help="arXiv search query, e.g. 'cat:cs.CL'")
+    parser.add_argument("--topic", help="Topic to store the papers under (default: derived from the query)")
+    parser.add_argument("--max-results", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--sort", choices=["submitted", "updated", "relevance"], default="submitted")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: papers/.harvest_<topic>.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress")
+    cli_args = parser.parse_args()
+
+    result = harvest(
+        cli_args.query,
+        topic=cli_args.topic,
+        max_results=cli_args.max_results,
+        page_size=cli_args.page_size,
+        workers=cli_args.workers,
+        batch_size=cli_args.batch_size,
+        sort_by=cli_args.sort,
+        checkpoint_path=cli_args.checkpoint,
+        restart=cli_args.restart
+    )
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,246 @@
+"""
+Token-budgeted conversation history for the chatbot.
+
+Before every model request the chatbot compacts its message history in place
+so that it fits a token budget. Tokens are counted locally with tiktoken when
+it is installed, otherwise estimated at four characters per token.
+
+Compaction works from the oldest messages forward and never touches the
+system prompt or the most recent turns:
+
+1. Old tool outputs are replaced by a one-line placeholder.
+2. If that is not enough, the oldest turns are dropped whole, so tool calls
+   and their results stay paired. With summarization enabled the dropped
+   turns are folded into a running summary message.
+3. As a last resort, tool outputs of the recent turns that the model has
+   already answered are elided too.
+
+Configuration (environment variables):
+    HISTORY_TOKEN_BUDGET: maximum tokens of history sent per request (default 16000)
+    HISTORY_KEEP_TURNS: most recent user turns that are never dropped (default 2)
+    HISTORY_SUMMARIZE: set to 1 to summarize dropped turns with the model
+"""
+
+import functools
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional, token counts fall back to an estimate
+    tiktoken = None
+
+logger = logging.getLogger('history')
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+ELIDED_PREFIX = "[Output of "
+ELIDED_TEMPLATE = ELIDED_PREFIX + "{name} elided from history ({tokens} tokens)]"
+
+# Fixed per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@functools.lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # tiktoken downloads its tables on first use, which fails offline
+        logger.warning("tiktoken unavailable, estimating token counts: %s", e)
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Count the tokens of a string, or estimate them without tiktoken."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def content_text(content) -> str:
+    """Flatten message content (string, None or a list of content parts) into text."""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for item in content:
+        if hasattr(item, 'text'):
+            parts.append(item.text)
+        elif isinstance(item, dict) and 'text' in item:
+            parts.append(item['text'])
+        else:
+            parts.append(str(item))
+    return "\n".join(parts)
+
+
+def message_tokens(message: dict, model: str = "gpt-4o") -> int:
+    """Tokens a chat message contributes to a request, including tool calls."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(content_text(message.get("content")), model)
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function") or {}
+        tokens += count_tokens(function.get("name", ""), model)
+        tokens += count_tokens(function.get("arguments", ""), model)
+    return tokens
+
+
+def _is_summary(message: dict) -> bool:
+    return message.get("role") == "system" and str(message.get("content") or "").startswith(SUMMARY_PREFIX)
+
+
+class HistoryManager:
+    """
+    Keeps a message history within a token budget.
+
+    stats holds the running totals: tokens currently retained, tokens removed
+    so far by eliding and dropping, and how many tool outputs, messages and
+    summaries were involved.
+    """
+
+    def __init__(self, budget: Optional[int] = None, keep_turns: Optional[int] = None,
+                 model: str = "gpt-4o", summarize: Optional[bool] = None):
+        self.budget = budget if budget is not None else int(os.environ.get("HISTORY_TOKEN_BUDGET", "16000"))
+        self.keep_turns = keep_turns if keep_turns is not None else int(os.environ.get("HISTORY_KEEP_TURNS", "2"))
+        self.model = model
+        self.summarize = summarize if summarize is not None else os.environ.get("HISTORY_SUMMARIZE", "0") == "1"
+        self.stats = {
+            'budget': self.budget,
+            'retained_tokens': 0,
+            'dropped_tokens': 0,
+            'elided_tool_outputs': 0,
+            'dropped_messages': 0,
+            'summaries': 0
+        }
+
+    def _elide(self, messages: List[dict], index: int) -> int:
+        """Replace a tool output with a placeholder; return the tokens saved."""
+        message = messages[index]
+        before = message_tokens(message, self.model)
+        placeholder = ELIDED_TEMPLATE.format(name=message.get("name", "tool"), tokens=before)
+        messages[index] = {**message, "content": placeholder}
+        saved = before - message_tokens(messages[index], self.model)
+        self.stats['elided_tool_outputs'] += 1
+        self.stats['dropped_tokens'] += saved
+        return saved
+
+    def _elide_range(self, messages: List[dict], start: int, end: int, total: int) -> int:
+        for index in range(start, end):
+            if total <= self.budget:
+                break
+            message = messages[index]
+            if message.get("role") == "tool" and not str(message.get("content") or "").startswith(ELIDED_PREFIX):
+                total -= self._elide(messages, index)
+        return total
+
+    async def compact(self, messages: List[dict],
+                      summarizer: Optional[Callable[[List[dict], str], Awaitable[str]]] = None) -> List[dict]:
+        """
+        Shrink messages in place until they fit the token budget.
+
+        Args:
+            messages: The chat history; it is modified in place
+            summarizer: Optional coroutine function (dropped messages, previous
+                summary) -> new summary, used when summarization is enabled
+
+        Returns:
+            The same list, for convenience
+        """
+        total = sum(message_tokens(message, self.model) for message in messages)
+        if total > self.budget:
+            total = await self._compact(messages, total, summarizer)
+        self.stats['retained_tokens'] = total
+        return messages
+
+    async def _compact(self, messages: List[dict], total: int, summarizer) -> int:
+        # The system prompt and any running summary stay at the front
+        head = 0
+        while head < len(messages) and messages[head].get("role") == "system":
+            head += 1
+
+        # Recent turns start at the keep_turns-th user message from the end
+        user_indices = [i for i in range(head, len(messages)) if messages[i].get("role") == "user"]
+        keep = min(max(1, self.keep_turns), len(user_indices))
+        protected = user_indices[-keep] if keep else head
+
+        # 1. Elide old tool outputs
+        total = self._elide_range(messages, head, protected, total)
+
+        # 2. Drop the oldest whole turns
+        if total > self.budget and protected > head:
+            boundaries = sorted({head, *(i for i in user_indices if i < protected)}) + [protected]
+            drop_end = head
+            for start, end in zip(boundaries, boundaries[1:]):
+                if total <= self.budget:
+                    break
+                total -= sum(message_tokens(message, self.model) for message in messages[start:end])
+                drop_end = end
+            dropped = messages[head:drop_end]
+            del messages[head:drop_end]
+            self.stats['dropped_messages'] += len(dropped)
+            self.stats['dropped_tokens'] += sum(message_tokens(message, self.model) for message in dropped)
+            if self.summarize and summarizer is not None:
+                total = await self._summarize(messages, dropped, total, summarizer)
+
+        # 3. Elide tool outputs of recent turns the model has already answered
+        if total > self.budget:
+            last_assistant = max(
+                (i for i, m in enumerate(messages) if m.get("role") == "assistant"), default=head
+            )
+            total = self._elide_range(messages, head, last_assistant, total)
+
+        if total > self.budget:
+            logger.warning("History still %d tokens after compaction (budget %d)", total, self.budget)
+        logger.info(
+            "History compacted to %d tokens; %d tokens dropped so far "
+            "(%d tool outputs elided, %d messages dropped)",
+            total, self.stats['dropped_tokens'], self.stats['elided_tool_outputs'],
+            self.stats['dropped_messages']
+        )
+        return total
+
+    async def _summarize(self, messages: List[dict], dropped: List[dict], total: int, summarizer) -> int:
+        """Fold dropped messages into the running summary message."""
+        summary_index = next((i for i, m in enumerate(messages) if _is_summary(m)), None)
+        previous = ""
+        if summary_index is not None:
+            previous = messages[summary_index]["content"][len(SUMMARY_PREFIX):]
+        try:
+            summary = await summarizer(dropped, previous)
+        except Exception as e:
+            logger.error("Error summarizing history: %s", e)
+            return total
+        if not summary:
+            return total
+
+        message = {"role": "system", "content": SUMMARY_PREFIX + summary}
+        if summary_index is None:
+            # Right after the system prompt
+            insert_at = 1 if messages and messages[0].get("role") == "system" else 0
+            messages.insert(insert_at, message)
+        else:
+            total -= message_tokens(messages[summary_index], self.model)
+            messages[summary_index] = message
+        self.stats['summaries'] += 1
+        return total + message_tokens(message, self.model)
+
+
+def transcript(messages: List[dict], max_chars: int = 1000) -> str:
+    """Render messages as plain text for a summarization request."""
+    lines = []
+    for message in messages:
+        text = content_text(message.get("content"))
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function") or {}
+            text += f"\n(called {function.get('name')} with {function.get('arguments')})"
+        if len(text) > max_chars:
+            text = text[:max_chars] + "..."
+        lines.append(f"{message.get('role')}: {text}")
+    return "\n".join(lines)
@@ -0,0 +1,233 @@
+"""
+Logging setup for the chatbot and web app.
+
+Records are put on a queue by the thread that logs them and formatted and
+written by a background listener thread, so a slow terminal or log file
+never holds up a chat turn. The queue is bounded; when it is full, records
+are dropped (and counted) instead of blocking the caller.
+
+Payloads such as tool results, resource contents and raw server responses
+go through log_payload on the "payload" logger. They are formatted lazily,
+capped at a configurable size, and can be sampled or switched off.
+
+Configuration (environment variables):
+    LOG_LEVEL: level of the root logger (default INFO)
+    LOG_LEVELS: per-category levels, e.g. "mcp_chatbot=DEBUG,httpx=WARNING,payload=INFO"
+    LOG_FORMAT: record format (default "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    LOG_QUEUE_SIZE: records buffered for the listener before dropping (default 10000)
+    LOG_PAYLOADS: payload logging mode, "off", "truncate" or "full" (default truncate)
+    LOG_PAYLOAD_CHARS: characters kept of each payload in truncate mode (default 200)
+    LOG_PAYLOAD_SAMPLE: fraction of payloads logged, between 0 and 1 (default 1)
+    LOG_CONFIG_FILE: JSON file re-read while running, e.g.
+        {"levels": {"mcp_chatbot": "DEBUG"}, "payloads": "full", "payload_sample": 0.1}
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger('log_config')
+payload_logger = logging.getLogger('payload')
+
+DEFAULT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# HTTP client internals log every request at DEBUG; keep them quiet unless
+# asked. Payloads are logged at DEBUG on their own logger, so LOG_PAYLOADS
+# alone decides whether they are written.
+DEFAULT_LEVELS = {
+    "httpcore": "WARNING",
+    "httpx": "WARNING",
+    "urllib3": "WARNING",
+    "openai": "INFO",
+    "payload": "DEBUG",
+}
+
+PAYLOAD_MODES = ("off", "truncate", "full")
+
+# Current payload settings, replaced as a whole so readers never see a mix
+_payload_settings = {'mode': "truncate", 'chars': 200, 'sample': 1.0}
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_configure_lock = threading.Lock()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener and drops records
+    instead of blocking when the queue is full.
+
+    The record's message and arguments are formatted on the listener thread,
+    so objects passed as log arguments must not be modified after the call.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Truncated:
+    """Log argument that renders a payload, capped to a number of characters, only when formatted."""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit: Optional[int]):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = self.value if isinstance(self.value, str) else str(self.value)
+        if self.limit is None or len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}... [{len(text) - self.limit} more characters]"
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "category=LEVEL,category=LEVEL", skipping malformed entries."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        level = level.strip().upper()
+        if name.strip() and isinstance(logging.getLevelName(level), int):
+            levels[name.strip()] = level
+        elif item.strip():
+            logger.warning("Ignoring invalid log level setting: %r", item)
+    return levels
+
+
+def set_levels(levels: Dict[str, str]) -> None:
+    """Set the level of each category (logger name); "root" is the root logger."""
+    for name, level in levels.items():
+        logging.getLogger(None if name == "root" else name).setLevel(level.upper())
+
+
+def set_payload_logging(mode: Optional[str] = None, chars: Optional[int] = None,
+                        sample: Optional[float] = None) -> None:
+    """
+    Change how payloads are logged; arguments left as None keep their value.
+
+    Args:
+        mode: "off", "truncate" (cap each payload at chars) or "full"
+        chars: Characters kept per payload in truncate mode
+        sample: Fraction of payloads that are logged at all
+    """
+    global _payload_settings
+    settings = dict(_payload_settings)
+    if mode is not None:
+        if mode not in PAYLOAD_MODES:
+            raise ValueError(f"Unknown payload logging mode: {mode}")
+        settings['mode'] = mode
+    if chars is not None:
+        settings['chars'] = max(0, int(chars))
+    if sample is not None:
+        settings['sample'] = min(1.0, max(0.0, float(sample)))
+    _payload_settings = settings
+
+
+def log_payload(label: str, value, level: int = logging.DEBUG) -> None:
+    """
+    Log a (possibly large) payload on the "payload" logger.
+
+    Nothing is converted to text unless the record is actually written, and
+    then only on the listener thread.
+    """
+    settings = _payload_settings
+    if settings['mode'] == "off" or not payload_logger.isEnabledFor(level):
+        return
+    if settings['sample'] < 1.0 and random.random() >= settings['sample']:
+        return
+    limit = settings['chars'] if settings['mode'] == "truncate" else None
+    payload_logger.log(level, "%s: %s", label, _Truncated(value, limit))
+
+
+def apply_config_file(path: str) -> None:
+    """Apply levels and payload settings from a JSON file (see the module docstring)."""
+    with open(path, "r") as config_file:
+        config = json.load(config_file)
+    if config.get("levels"):
+        set_levels(config["levels"])
+    set_payload_logging(config.get("payloads"), config.get("payload_chars"), config.get("payload_sample"))
+    logger.info("Applied logging settings from %s", path)
+
+
+def _watch_config_file(path: str, interval: float = 2.0) -> None:
+    """Re-apply the config file whenever it changes."""
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime != last_mtime:
+                last_mtime = mtime
+                apply_config_file(path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning("Error applying logging settings from %s: %s", path, e)
+        time.sleep(interval)
+
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def configure_logging(level: Optional[str] = None, handler: Optional[logging.Handler] = None) -> None:
+    """
+    Route all logging through a queue to a background listener.
+
+    Safe to call more than once; only the first call installs the handlers.
+
+    Args:
+        level: Root level, overriding LOG_LEVEL
+        handler: Where records end up (default: a stream handler on stderr)
+    """
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        if handler is None:
+            handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(os.environ.get("LOG_FORMAT", DEFAULT_FORMAT)))
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", "10000"))))
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(_queue_handler)
+        root.setLevel((level or os.environ.get("LOG_LEVEL", "INFO")).upper())
+
+        set_levels(DEFAULT_LEVELS)
+        set_levels(_parse_levels(os.environ.get("LOG_LEVELS", "")))
+        try:
+            set_payload_logging(
+                os.environ.get("LOG_PAYLOADS", "truncate"),
+                os.environ.get("LOG_PAYLOAD_CHARS", "200"),
+                os.environ.get("LOG_PAYLOAD_SAMPLE", "1")
+            )
+        except ValueError as e:
+            logger.warning("Ignoring invalid payload logging settings: %s", e)
+
+        config_path = os.environ.get("LOG_CONFIG_FILE")
+        if config_path:
+            threading.Thread(target=_watch_config_file, args=(config_path,),
+                             name="log-config-watch", daemon=True).start()
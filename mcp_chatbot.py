@@ -1,18 +1,23 @@
 import os
+import copy
 import logging
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
 from asyncio import gather, sleep
-from contextlib import AsyncExitStack
 import json
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 import asyncio
+import time
 import nest_asyncio
+from history import HistoryManager, transcript
+from log_config import configure_logging, log_payload
+from metrics import increment, metrics, observe, span
+from spill_store import READ_TOOL, READ_TOOL_NAME, SpillStore
+from supervisor import ServerSupervisor
+from tool_router import ToolRouter
+from ttl_cache import TTLCache
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Logging is configured by the entry point (main below, or app.py), see log_config.py
 logger = logging.getLogger('mcp_chatbot')
 
 nest_asyncio.apply()
@@ -21,16 +26,35 @@ load_dotenv()
 
 class MCP_ChatBot:
     def __init__(self):
-        self.exit_stack = AsyncExitStack()
-        
         # Initialize OpenAI client with proper error handling
         api_key = os.environ.get("OPENAI_API_KEY")
         if not api_key:
             logger.warning("OPENAI_API_KEY not found in environment variables")
         
+        # Model and client settings; OPENAI_BASE_URL can point at a local
+        # OpenAI-compatible server such as stub_llm_server.py
+        self.model = os.environ.get("OPENAI_MODEL", "gpt-4o")
+        timeout = float(os.environ.get("OPENAI_TIMEOUT", "60"))
+        max_retries = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+        max_connections = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20"))
+        
         try:
-            # Try initializing with the new API (OpenAI 1.x)
-            self.openai = OpenAI(api_key=api_key)
+            # Try initializing with the new API (OpenAI 1.x). The async client
+            # keeps the event loop free while a completion is in flight, and
+            # its pooled HTTP client is shared by every conversation.
+            self.openai = AsyncOpenAI(
+                api_key=api_key,
+                base_url=os.environ.get("OPENAI_BASE_URL") or None,
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=httpx.AsyncClient(
+                    timeout=timeout,
+                    limits=httpx.Limits(
+                        max_connections=max_connections,
+                        max_keepalive_connections=max_connections
+                    )
+                )
+            )
         except TypeError as e:
             if "unexpected keyword argument 'proxies'" in str(e):
                 # Fallback for older versions or specific configuration issues
@@ -42,130 +66,215 @@ class MCP_ChatBot:
                 # Re-raise if it's a different TypeError
                 raise
         
-        # Tools list required for OpenAI API
-        self.available_tools = []
+        # Tools list required for OpenAI API; starts with the local tool for
+        # reading tool outputs that were too large to keep in the history
+        self.available_tools = [READ_TOOL]
+        # Picks the tools relevant to each request from available_tools
+        self.router = ToolRouter(model=self.model)
+        # Size caps for tool results, with oversized outputs spilled to disk
+        self.spill = SpillStore()
         # Prompts list for quick display 
         self.available_prompts = []
         # Sessions dict maps tool/prompt names or resource URIs to MCP client sessions
         self.sessions = {}
-        # Message history
+        # Server name of each session, for cache keys
+        self.session_servers = {}
+        # Names routed to each server, so a restarted server's routes can be replaced
+        self.server_routes = {}
+        # Starts the servers, checks their health and swaps in restarted sessions
+        self.supervisor = ServerSupervisor(on_swap=self._register_server)
+        # Tools the servers mark as read-only; their results can be cached
+        self.read_only_tools = set()
+        # Results of read-only tool calls and resource reads, keyed by
+        # (server, tool or "resource", canonical arguments or URI). A call to
+        # any other tool drops the entries of its server.
+        self.call_cache = TTLCache(
+            maxsize=int(os.environ.get("MCP_CALL_CACHE_SIZE", "256")),
+            ttl=float(os.environ.get("MCP_CALL_CACHE_TTL", "300"))
+        )
+        # Bumped on invalidation, so reads that raced a write are not cached
+        self.cache_generations = {}
+        # Resource URI prefixes that change on their own and are never cached
+        self.uncached_resources = tuple(
+            prefix for prefix in os.environ.get("MCP_UNCACHED_RESOURCES", "cache://,metrics://").split(",") if prefix
+        )
+        # Message history, kept within a token budget by the history manager
         self.message_history = []
+        self.history = HistoryManager(model=self.model)
+        # Token usage of the last turn, see process_query
+        self.last_usage = None
+        # Per-server startup time and outcome, filled in by connect_to_servers
+        self.server_timings = {}
+        # Maximum number of tool calls from one model turn running at once
+        self.tool_concurrency = int(os.environ.get("MCP_TOOL_CONCURRENCY", "4"))
+
+    def new_conversation(self):
+        """
+        Return a chatbot for another conversation.
+
+        It shares this chatbot's server sessions, tool and prompt lists and
+        OpenAI client, but has its own message history.
+        """
+        conversation = copy.copy(self)
+        conversation.message_history = []
+        conversation.history = HistoryManager(model=self.model)
+        return conversation
 
     async def connect_to_server(self, server_name, server_config):
-        try:
-            logger.info(f"Connecting to server: {server_name}")
-            logger.debug(f"Server config: {server_config}")
-            
-            # Extract command and args from config
-            command = server_config.get("command")
-            args = server_config.get("args", [])
-            cwd = server_config.get("cwd", ".")
-            
-            # Create server parameters
-            server_params = StdioServerParameters(
-                command=command,
-                args=args,
-                cwd=cwd
-            )
-            
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            read, write = stdio_transport
-            session = await self.exit_stack.enter_async_context(
-                ClientSession(read, write)
-            )
-            
-            logger.info(f"Initializing session for {server_name}")
+        with span("mcp_connect", server=server_name) as connect:
             try:
-                # Add a timeout for initialization
-                initialization_task = asyncio.create_task(session.initialize())
-                await asyncio.wait_for(initialization_task, timeout=10.0)  # 10 second timeout
-                logger.info(f"Session initialized for {server_name}")
+                logger.info("Connecting to server: %s", server_name)
+                log_payload("Server config", server_config)
+                
+                # The supervisor starts the process, initializes the session and
+                # calls _register_server with it
+                await self.supervisor.start(server_name, server_config)
+                logger.info("Session initialized for %s", server_name)
+                return True
             except asyncio.TimeoutError:
-                logger.error(f"Timeout initializing session for {server_name}")
+                connect.fail()
+                logger.error("Timeout initializing session for %s", server_name)
                 print(f"Timeout initializing session for {server_name}")
-                return
+                return False
             except Exception as e:
-                logger.error(f"Error initializing session for {server_name}: {e}")
+                connect.fail()
+                logger.error("Error connecting to %s: %s", server_name, e)
                 print(f"Error initializing session for {server_name}: {e}")
-                return
+                return False
+
+    async def _register_server(self, server_name, session):
+        """
+        Route a server's tools, prompts and resources to a session.
+        
+        Called for a server's first session and again whenever the supervisor
+        replaces it. Everything is discovered first and then swapped into the
+        shared routing tables without awaiting in between, so concurrent
+        requests see either the old session or the new one, never a mix.
+        """
+        routes = {}
+        tools = []
+        prompts = []
+        read_only = set()
+        try:
+            # List available tools
+            logger.info("Listing tools for %s", server_name)
+            response = await session.list_tools()
+            log_payload("Tools response", response)
             
-            try:
-                # List available tools
-                logger.info(f"Listing tools for {server_name}")
-                response = await session.list_tools()
-                logger.debug(f"Tools response: {response}")
-                
-                if hasattr(response, 'tools'):
-                    for tool in response.tools:
-                        self.sessions[tool.name] = session
-                        
-                        # Convert MCP tool to OpenAI tool format
-                        openai_tool = {
-                            "type": "function",
-                            "function": {
-                                "name": tool.name,
-                                "description": tool.description,
-                                "parameters": tool.inputSchema
-                            }
+            if hasattr(response, 'tools'):
+                for tool in response.tools:
+                    routes[tool.name] = session
+                    annotations = getattr(tool, 'annotations', None)
+                    if annotations is not None and annotations.readOnlyHint:
+                        read_only.add(tool.name)
+                    
+                    # Convert MCP tool to OpenAI tool format
+                    tools.append({
+                        "type": "function",
+                        "function": {
+                            "name": tool.name,
+                            "description": tool.description,
+                            "parameters": tool.inputSchema
                         }
-                        self.available_tools.append(openai_tool)
-                        logger.info(f"Added tool: {tool.name}")
+                    })
+                    logger.info("Added tool: %s", tool.name)
+            else:
+                logger.warning("No tools found in response from %s", server_name)
+        
+            # List available prompts
+            logger.info("Listing prompts for %s", server_name)
+            try:
+                # Check if the server supports list_prompts
+                if hasattr(session, 'list_prompts'):
+                    prompts_response = await session.list_prompts()
+                    log_payload("Prompts response", prompts_response)
+                    
+                    if prompts_response and hasattr(prompts_response, 'prompts') and prompts_response.prompts:
+                        for prompt in prompts_response.prompts:
+                            routes[prompt.name] = session
+                            prompts.append({
+                                "name": prompt.name,
+                                "description": prompt.description,
+                                "arguments": prompt.arguments
+                            })
+                            logger.info("Added prompt: %s", prompt.name)
                 else:
-                    logger.warning(f"No tools found in response: {response}")
+                    logger.info("Server %s does not support list_prompts", server_name)
+            except Exception as e:
+                if "Method not found" in str(e):
+                    logger.info("Server %s does not support list_prompts", server_name)
+                else:
+                    logger.error("Error listing prompts: %s", e)
             
-                # List available prompts
-                logger.info(f"Listing prompts for {server_name}")
-                try:
-                    # Check if the server supports list_prompts
-                    if hasattr(session, 'list_prompts'):
-                        prompts_response = await session.list_prompts()
-                        logger.debug(f"Prompts response: {prompts_response}")
-                        
-                        if prompts_response and hasattr(prompts_response, 'prompts') and prompts_response.prompts:
-                            for prompt in prompts_response.prompts:
-                                self.sessions[prompt.name] = session
-                                self.available_prompts.append({
-                                    "name": prompt.name,
-                                    "description": prompt.description,
-                                    "arguments": prompt.arguments
-                                })
-                                logger.info(f"Added prompt: {prompt.name}")
-                    else:
-                        logger.info(f"Server {server_name} does not support list_prompts")
-                except Exception as e:
-                    if "Method not found" in str(e):
-                        logger.info(f"Server {server_name} does not support list_prompts")
-                    else:
-                        logger.error(f"Error listing prompts: {e}")
-                
-                # List available resources
-                logger.info(f"Listing resources for {server_name}")
-                try:
-                    # Check if the server supports list_resources
-                    if hasattr(session, 'list_resources'):
-                        resources_response = await session.list_resources()
-                        logger.debug(f"Resources response: {resources_response}")
-                        
-                        if resources_response and hasattr(resources_response, 'resources') and resources_response.resources:
-                            for resource in resources_response.resources:
-                                resource_uri = str(resource.uri)
-                                self.sessions[resource_uri] = session
-                                logger.info(f"Added resource: {resource_uri}")
-                    else:
-                        logger.info(f"Server {server_name} does not support list_resources")
-                except Exception as e:
-                    if "Method not found" in str(e):
-                        logger.info(f"Server {server_name} does not support list_resources")
-                    else:
-                        logger.error(f"Error listing resources: {e}")
-                
+            # List available resources
+            logger.info("Listing resources for %s", server_name)
+            try:
+                # Check if the server supports list_resources
+                if hasattr(session, 'list_resources'):
+                    resources_response = await session.list_resources()
+                    log_payload("Resources response", resources_response)
+                    
+                    if resources_response and hasattr(resources_response, 'resources') and resources_response.resources:
+                        for resource in resources_response.resources:
+                            resource_uri = str(resource.uri)
+                            routes[resource_uri] = session
+                            logger.info("Added resource: %s", resource_uri)
+                else:
+                    logger.info("Server %s does not support list_resources", server_name)
             except Exception as e:
-                logger.error(f"Error during server capabilities discovery: {e}")
-                
+                if "Method not found" in str(e):
+                    logger.info("Server %s does not support list_resources", server_name)
+                else:
+                    logger.error("Error listing resources: %s", e)
+            
         except Exception as e:
-            logger.error(f"Error connecting to {server_name}: {e}")
+            logger.error("Error during server capabilities discovery: %s", e)
+        
+        # Swap the new routes in. The lists and dicts are updated in place
+        # because conversations created by new_conversation share them.
+        old_names = self.server_routes.get(server_name, set())
+        for name in old_names - routes.keys():
+            self.sessions.pop(name, None)
+        self.sessions.update(routes)
+        self.available_tools[:] = [
+            tool for tool in self.available_tools if tool["function"]["name"] not in old_names
+        ] + tools
+        self.available_prompts[:] = [
+            prompt for prompt in self.available_prompts if prompt["name"] not in old_names
+        ] + prompts
+        self.read_only_tools.difference_update(old_names)
+        self.read_only_tools.update(read_only)
+        for old_session, name in list(self.session_servers.items()):
+            if name == server_name:
+                del self.session_servers[old_session]
+        self.session_servers[session] = server_name
+        self.server_routes[server_name] = set(routes)
+        if old_names:
+            # Cached results may predate the restart
+            self._invalidate_server(server_name)
+
+    async def _connect_with_timeout(self, server_name, server_config):
+        """Connect to one server with a timeout and record how long it took."""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            # Set a timeout for each server connection
+            connected = await asyncio.wait_for(
+                self.connect_to_server(server_name, server_config),
+                timeout=30.0  # 30 second timeout
+            )
+            status = "connected" if connected else "failed"
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.error("Timeout connecting to server: %s", server_name)
+            print(f"Timeout connecting to server: {server_name}")
+        except Exception as e:
+            logger.error("Error connecting to server %s: %s", server_name, e)
+            print(f"Error connecting to server {server_name}: {e}")
+        finally:
+            elapsed = time.perf_counter() - start
+            self.server_timings[server_name] = {"seconds": round(elapsed, 3), "status": status}
+            logger.info("Server %s %s after %.2fs", server_name, status, elapsed)
 
     async def connect_to_servers(self):
         try:
@@ -173,29 +282,158 @@ class MCP_ChatBot:
             with open("server_config.json", "r") as file:
                 data = json.load(file)
             servers = data.get("mcpServers", {})
-            logger.info(f"Found {len(servers)} servers in config")
+            logger.info("Found %d servers in config", len(servers))
             
-            # Connect to servers with timeout
-            for server_name, server_config in servers.items():
-                try:
-                    # Set a timeout for each server connection
-                    connection_task = asyncio.create_task(
-                        self.connect_to_server(server_name, server_config)
-                    )
-                    await asyncio.wait_for(connection_task, timeout=30.0)  # 30 second timeout
-                except asyncio.TimeoutError:
-                    logger.error(f"Timeout connecting to server: {server_name}")
-                    print(f"Timeout connecting to server: {server_name}")
-                except Exception as e:
-                    logger.error(f"Error connecting to server {server_name}: {e}")
-                    print(f"Error connecting to server {server_name}: {e}")
+            # Connect to all servers concurrently; each one registers its
+            # tools, prompts and resources as soon as it is ready, so startup
+            # takes as long as the slowest server rather than the sum
+            start = time.perf_counter()
+            await gather(*(
+                self._connect_with_timeout(server_name, server_config)
+                for server_name, server_config in servers.items()
+            ))
+            logger.info("Connected to servers in %.2fs", time.perf_counter() - start)
+            self.supervisor.run()
         except Exception as e:
-            logger.error(f"Error loading server config: {e}")
+            logger.error("Error loading server config: %s", e)
             print(f"Error loading server config: {e}")
     
-    async def process_query(self, query):
-        logger.info(f"Processing query: {query}")
+    @staticmethod
+    def _print_event(event):
+        """Default event handler for the command-line chat: print each event."""
+        kind = event["type"]
+        if kind == "delta":
+            print(event["content"], end="", flush=True)
+        elif kind == "tool_call":
+            print(f"\nCalling tool: {event['name']}")
+        elif kind == "tool_result":
+            print(f"Tool result: {event['content'][:100]}...")
+        elif kind == "assistant":
+            print(f"\nAssistant: {event['content']}")
+        elif kind == "resource":
+            print(f"\nResource: {event['uri']}")
+            print("Content:")
+            print(event["content"])
+        elif kind == "prompts":
+            print(event["content"])
+        elif kind == "prompt":
+            print(f"\nExecuting prompt '{event['name']}'...")
+        elif kind == "error":
+            print(f"\n{event['content']}")
+
+    @staticmethod
+    def _emit(on_event, event):
+        """Forward an event to the caller's callback, or print it when there is none."""
+        if on_event is None:
+            MCP_ChatBot._print_event(event)
+        else:
+            on_event(event)
+
+    @staticmethod
+    def _content_text(content):
+        """Flatten MCP content items (or plain strings) into text."""
+        if isinstance(content, str):
+            return content
+        return "\n".join(item.text if hasattr(item, 'text') else str(item) for item in content)
+
+    @staticmethod
+    def _add_usage(usage, response_usage):
+        """Add the token counts reported for one completion to a turn's totals."""
+        if not response_usage:
+            return
+        for key in ("prompt_tokens", "completion_tokens"):
+            value = response_usage.get(key) if isinstance(response_usage, dict) else getattr(response_usage, key, None)
+            usage[key] += value or 0
+
+    async def _stream_completion(self, on_event, usage, tools):
+        """
+        Request a streamed completion, forwarding text deltas as they arrive.
+
+        Returns the assembled assistant message as a dict, with tool calls
+        rebuilt from their streamed fragments. Token counts from the final
+        usage chunk are added to usage; tools are the tool schemas to send.
+        """
+        with span("openai_request", model=self.model, stream="true"):
+            started = time.perf_counter()
+            stream = await self.openai.chat.completions.create(
+                model=self.model,
+                messages=self.message_history,
+                tools=tools if tools else None,
+                tool_choice="auto",
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            first_chunk = True
+            content_parts = []
+            tool_calls = {}
+            async for chunk in stream:
+                self._add_usage(usage, getattr(chunk, 'usage', None))
+                if not chunk.choices:
+                    continue
+                if first_chunk:
+                    first_chunk = False
+                    observe("openai_first_chunk_seconds", time.perf_counter() - started, model=self.model)
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    self._emit(on_event, {"type": "delta", "content": delta.content})
+                for tool_call in delta.tool_calls or []:
+                    entry = tool_calls.setdefault(tool_call.index, {
+                        "id": None,
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""}
+                    })
+                    if tool_call.id:
+                        entry["id"] = tool_call.id
+                    if tool_call.function:
+                        if tool_call.function.name:
+                            entry["function"]["name"] += tool_call.function.name
+                        if tool_call.function.arguments:
+                            entry["function"]["arguments"] += tool_call.function.arguments
+        
+        message = {"role": "assistant", "content": "".join(content_parts) or None}
+        if tool_calls:
+            message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+        return message
+
+    async def process_query(self, query, stream=False, on_event=None):
+        """
+        Run one user query through the model and any tools it calls.
         
+        Args:
+            query: The user's message
+            stream: Stream the model's answer token by token (OpenAI 1.x client only)
+            on_event: Optional callback receiving progress events as dicts:
+                {"type": "delta", "content"} for streamed text,
+                {"type": "tool_call", "name", "arguments"},
+                {"type": "tool_result", "name", "content"},
+                {"type": "assistant", "content", "usage"} for the final answer
+                and {"type": "error", "content"}. Without a callback the
+                events are printed.
+        
+        Returns:
+            The final assistant answer, or None if the request failed
+        """
+        logger.info("Processing query")
+        log_payload("Query", query)
+        usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        with span("chatbot_turn", model=self.model) as turn:
+            content = await self._run_turn(query, stream, on_event, usage)
+            if content is None:
+                turn.fail()
+            turn.set(**usage)
+        
+        # Token usage per turn, as reported by the API (zero if it reports none)
+        self.last_usage = usage
+        for key, tokens in usage.items():
+            kind = key[:-len("_tokens")]
+            observe("chatbot_turn_tokens", tokens, kind=kind)
+            increment("chatbot_tokens_total", tokens, kind=kind, purpose="turn")
+        logger.info("Turn used %d prompt and %d completion tokens", usage["prompt_tokens"], usage["completion_tokens"])
+        return content
+
+    async def _run_turn(self, query, stream, on_event, usage):
+        """The model and tool loop of process_query; adds token counts to usage."""
         # Initialize with system message if history is empty
         if not self.message_history:
             self.message_history.append({
@@ -209,26 +447,43 @@ class MCP_ChatBot:
         while True:
             logger.info("Sending request to OpenAI")
             try:
+                # Trim old turns and tool outputs so the request fits the token budget
+                with span("history_compact"):
+                    await self.history.compact(self.message_history, self._summarize_history)
+                # Send only the tools relevant to this turn
+                tools = self.router.select(self.message_history, self.available_tools)
+                
                 # Check if we're using the new OpenAI client or the fallback
-                if hasattr(self.openai, 'chat') and hasattr(self.openai.chat, 'completions'):
+                if stream and hasattr(self.openai, 'chat') and hasattr(self.openai.chat, 'completions'):
+                    # New OpenAI client (1.x), streaming
+                    message = await self._stream_completion(on_event, usage, tools)
+                    # Add assistant message to history
+                    self.message_history.append(message)
+                elif hasattr(self.openai, 'chat') and hasattr(self.openai.chat, 'completions'):
                     # New OpenAI client (1.x)
-                    response = self.openai.chat.completions.create(
-                        model="gpt-4o",
-                        messages=self.message_history,
-                        tools=self.available_tools if self.available_tools else None,
-                        tool_choice="auto"
-                    )
+                    with span("openai_request", model=self.model, stream="false"):
+                        response = await self.openai.chat.completions.create(
+                            model=self.model,
+                            messages=self.message_history,
+                            tools=tools if tools else None,
+                            tool_choice="auto"
+                        )
+                    self._add_usage(usage, response.usage)
                     message = response.choices[0].message
                     # Add assistant message to history
                     self.message_history.append(message.model_dump())
                 else:
-                    # Fallback to older OpenAI client
-                    response = self.openai.ChatCompletion.create(
-                        model="gpt-4o",
-                        messages=self.message_history,
-                        functions=[tool["function"] for tool in self.available_tools] if self.available_tools else None,
-                        function_call="auto"
-                    )
+                    # Fallback to older OpenAI client, which is synchronous,
+                    # so run it on a worker thread to keep the loop free
+                    with span("openai_request", model=self.model, stream="false"):
+                        response = await asyncio.to_thread(
+                            self.openai.ChatCompletion.create,
+                            model=self.model,
+                            messages=self.message_history,
+                            functions=[tool["function"] for tool in tools] if tools else None,
+                            function_call="auto"
+                        )
+                    self._add_usage(usage, response.get("usage"))
                     message = response.choices[0].message
                     # Add assistant message to history
                     self.message_history.append(dict(message))
@@ -237,8 +492,11 @@ class MCP_ChatBot:
                 has_tool_calls = False
                 tool_calls = []
                 
-                # Handle both new and old API formats
-                if hasattr(message, 'tool_calls') and message.tool_calls:
+                # Handle streamed, new and old API formats
+                if isinstance(message, dict):
+                    tool_calls = message.get("tool_calls") or []
+                    has_tool_calls = bool(tool_calls)
+                elif hasattr(message, 'tool_calls') and message.tool_calls:
                     has_tool_calls = True
                     tool_calls = message.tool_calls
                 elif hasattr(message, 'function_call') and message.function_call:
@@ -253,81 +511,218 @@ class MCP_ChatBot:
                     }]
                 
                 if has_tool_calls:
-                    # Process each tool call
-                    for tool_call in tool_calls:
-                        # Extract function name and arguments based on API version
-                        if hasattr(tool_call, 'function'):
-                            function_name = tool_call.function.name
-                            function_args = json.loads(tool_call.function.arguments)
-                            tool_call_id = tool_call.id
-                        else:
-                            function_name = tool_call["function"]["name"]
-                            function_args = json.loads(tool_call["function"]["arguments"])
-                            tool_call_id = tool_call["id"]
-                        
-                        logger.info(f"Tool call requested: {function_name}")
-                        print(f"\nCalling tool: {function_name}")
-                        
-                        # Get the session for this tool
-                        session = self.sessions.get(function_name)
-                        if not session:
-                            error_msg = f"Tool '{function_name}' not found."
-                            logger.error(error_msg)
-                            print(error_msg)
-                            
-                            # Add tool result to history
-                            self.message_history.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call_id,
-                                "name": function_name,
-                                "content": error_msg
-                            })
-                            continue
-                        
-                        try:
-                            # Call the tool via MCP
-                            logger.info(f"Calling tool {function_name} with args: {function_args}")
-                            result = await session.call_tool(function_name, arguments=function_args)
-                            
-                            # Add tool result to history
-                            tool_result = {
-                                "role": "tool",
-                                "tool_call_id": tool_call_id,
-                                "name": function_name,
-                                "content": result.content
-                            }
-                            self.message_history.append(tool_result)
-                            logger.info(f"Tool result: {result.content[:100]}...")
-                            print(f"Tool result: {result.content[:100]}...")
-                            
-                        except Exception as e:
-                            error_msg = f"Error calling tool {function_name}: {str(e)}"
-                            logger.error(error_msg)
-                            print(error_msg)
-                            
-                            # Add error message as tool result
-                            self.message_history.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call_id,
-                                "name": function_name,
-                                "content": f"Error: {str(e)}"
-                            })
+                    # Run the tool calls concurrently (they often target
+                    # different servers) but keep their results in order
+                    semaphore = asyncio.Semaphore(self.tool_concurrency)
+                    tool_results = await gather(*(
+                        self._execute_tool_call(tool_call, semaphore, on_event)
+                        for tool_call in tool_calls
+                    ))
+                    self.message_history.extend(tool_results)
                     
                     # Continue the conversation with tool results
                     continue
                 else:
-                    # No tool calls, just print the response
+                    # No tool calls, this is the final answer
                     content = message.content if hasattr(message, 'content') else message["content"]
-                    print(f"\nAssistant: {content}")
-                    break
+                    self._emit(on_event, {"type": "assistant", "content": content, "usage": dict(usage)})
+                    return content
                     
             except Exception as e:
-                logger.error(f"Error in OpenAI API call: {e}")
-                print(f"\nError: {str(e)}")
-                break
+                logger.error("Error in OpenAI API call: %s", e)
+                self._emit(on_event, {"type": "error", "content": f"Error: {str(e)}"})
+                return None
+
+    async def _summarize_history(self, messages, previous_summary):
+        """Summarize history messages that are about to be dropped, extending the previous summary."""
+        if not (hasattr(self.openai, 'chat') and hasattr(self.openai.chat, 'completions')):
+            return previous_summary
+        response = await self.openai.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Summarize this conversation excerpt in a few sentences for later reference. "
+                               "Keep paper IDs, topics, tool findings and user preferences."
+                },
+                {
+                    "role": "user",
+                    "content": f"Previous summary:\n{previous_summary or '(none)'}\n\n"
+                               f"Conversation:\n{transcript(messages)}"
+                }
+            ],
+            max_tokens=300
+        )
+        if response.usage:
+            increment("chatbot_tokens_total", response.usage.prompt_tokens, kind="prompt", purpose="summary")
+            increment("chatbot_tokens_total", response.usage.completion_tokens, kind="completion", purpose="summary")
+        return response.choices[0].message.content
+
+    async def _execute_tool_call(self, tool_call, semaphore, on_event=None):
+        """Run one tool call requested by the model and return its tool message."""
+        # Extract function name and arguments based on API version
+        if hasattr(tool_call, 'function'):
+            function_name = tool_call.function.name
+            function_args = json.loads(tool_call.function.arguments)
+            tool_call_id = tool_call.id
+        else:
+            function_name = tool_call["function"]["name"]
+            function_args = json.loads(tool_call["function"]["arguments"])
+            tool_call_id = tool_call["id"]
+        
+        logger.info("Tool call requested: %s", function_name)
+        self._emit(on_event, {"type": "tool_call", "name": function_name, "arguments": function_args})
+        
+        if function_name == READ_TOOL_NAME:
+            # Local tool, answered from the spill store without a server
+            try:
+                content = self.spill.read(**function_args)
+            except (TypeError, ValueError) as e:
+                content = f"Error: {str(e)}"
+            self._emit(on_event, {"type": "tool_result", "name": function_name, "content": content[:500]})
+            return {
+                "role": "tool",
+                "tool_call_id": tool_call_id,
+                "name": function_name,
+                "content": content
+            }
+        
+        # Get the session for this tool
+        session = self.sessions.get(function_name)
+        if not session:
+            error_msg = f"Tool '{function_name}' not found."
+            logger.error(error_msg)
+            self._emit(on_event, {"type": "tool_result", "name": function_name, "content": error_msg})
+            
+            return {
+                "role": "tool",
+                "tool_call_id": tool_call_id,
+                "name": function_name,
+                "content": error_msg
+            }
+        
+        try:
+            # Call the tool via MCP
+            logger.info("Calling tool %s", function_name)
+            log_payload("Tool arguments", function_args)
+            text = await self._call_tool(session, function_name, function_args, semaphore)
+            
+            # Send the model text, capped so one large output does not bloat
+            # every later request
+            log_payload("Tool result", text)
+            self._emit(on_event, {
+                "type": "tool_result",
+                "name": function_name,
+                "content": text[:500]
+            })
+            return {
+                "role": "tool",
+                "tool_call_id": tool_call_id,
+                "name": function_name,
+                "content": self.spill.cap(function_name, text)
+            }
+            
+        except Exception as e:
+            error_msg = f"Error calling tool {function_name}: {str(e)}"
+            logger.error(error_msg)
+            # Tool failures come back as error results; an exception means the
+            # connection itself may be broken, so have the server checked now
+            self.supervisor.report_failure(self.session_servers.get(session))
+            self._emit(on_event, {"type": "tool_result", "name": function_name, "content": error_msg})
+            
+            # Return the error message as tool result
+            return {
+                "role": "tool",
+                "tool_call_id": tool_call_id,
+                "name": function_name,
+                "content": f"Error: {str(e)}"
+            }
+
+    @staticmethod
+    def _cache_key(server_name, name, arguments):
+        return (server_name, name, json.dumps(arguments, sort_keys=True, separators=(",", ":")))
+
+    def _invalidate_server(self, server_name):
+        """Drop cached results of a server after one of its tools may have changed its data."""
+        self.cache_generations[server_name] = self.cache_generations.get(server_name, 0) + 1
+        dropped = self.call_cache.invalidate(lambda key: key[0] == server_name)
+        if dropped:
+            logger.info("Invalidated %d cached results of %s", dropped, server_name)
+
+    async def _call_tool(self, session, function_name, function_args, semaphore):
+        """
+        Call a tool and return its output as text.
+        
+        Read-only tools are answered from the call cache when possible. Any
+        other tool may change server state, so it invalidates its server's
+        cached results.
+        """
+        server_name = self.session_servers.get(session)
+        if function_name not in self.read_only_tools:
+            try:
+                async with semaphore:
+                    result = await self._timed_call_tool(session, server_name, function_name, function_args)
+            finally:
+                self._invalidate_server(server_name)
+            return self._content_text(result.content)
+        
+        key = self._cache_key(server_name, function_name, function_args)
+        text = self.call_cache.get(key)
+        if text is not None:
+            logger.info("Cache hit for tool %s", function_name)
+            return text
+        
+        generation = self.cache_generations.get(server_name, 0)
+        async with semaphore:
+            result = await self._timed_call_tool(session, server_name, function_name, function_args)
+        text = self._content_text(result.content)
+        # Do not cache errors, or results a concurrent write may have made stale
+        if not getattr(result, 'isError', False) and self.cache_generations.get(server_name, 0) == generation:
+            self.call_cache.set(key, text)
+        return text
+
+    @staticmethod
+    async def _timed_call_tool(session, server_name, function_name, function_args):
+        """Call a tool on its server inside an mcp_tool_call span; error results count as failures."""
+        with span("mcp_tool_call", server=server_name, tool=function_name) as call:
+            result = await session.call_tool(function_name, arguments=function_args)
+            if getattr(result, 'isError', False):
+                call.fail()
+        return result
 
-    async def get_resource(self, resource_uri):
-        logger.info(f"Getting resource: {resource_uri}")
+    async def _read_resource(self, session, resource_uri):
+        """Read a resource's text (None if empty), using the call cache."""
+        server_name = self.session_servers.get(session)
+        cacheable = not resource_uri.startswith(self.uncached_resources)
+        key = (server_name, "resource", resource_uri)
+        if cacheable:
+            content = self.call_cache.get(key)
+            if content is not None:
+                logger.info("Cache hit for resource %s", resource_uri)
+                return content
+        
+        generation = self.cache_generations.get(server_name, 0)
+        with span("mcp_resource_read", {'uri': resource_uri}, server=server_name):
+            result = await session.read_resource(uri=resource_uri)
+        log_payload("Resource result", result)
+        if not (result and hasattr(result, 'contents') and result.contents):
+            return None
+        content = result.contents[0].text
+        if cacheable and self.cache_generations.get(server_name, 0) == generation:
+            self.call_cache.set(key, content)
+        return content
+
+    async def get_resource(self, resource_uri, on_event=None):
+        """
+        Read a resource from the server that provides it.
+        
+        Emits {"type": "resource", "uri", "content"} on success and
+        {"type": "error", "content"} otherwise.
+        
+        Returns:
+            The resource text, or None if it could not be read
+        """
+        logger.info("Getting resource: %s", resource_uri)
         session = self.sessions.get(resource_uri)
         
         # Fallback for papers URIs - try any papers resource session
@@ -338,77 +733,112 @@ class MCP_ChatBot:
                     break
             
         if not session:
-            logger.error(f"Resource '{resource_uri}' not found.")
-            print(f"Resource '{resource_uri}' not found.")
-            return
+            logger.error("Resource '%s' not found.", resource_uri)
+            self._emit(on_event, {"type": "error", "content": f"Resource '{resource_uri}' not found."})
+            return None
         
         try:
-            logger.info(f"Reading resource: {resource_uri}")
-            result = await session.read_resource(uri=resource_uri)
-            logger.debug(f"Resource result: {result}")
+            logger.info("Reading resource: %s", resource_uri)
+            content = await self._read_resource(session, resource_uri)
             
-            if result and hasattr(result, 'contents') and result.contents:
-                print(f"\nResource: {resource_uri}")
-                print("Content:")
-                print(result.contents[0].text)
-            else:
-                logger.warning(f"No content available for resource: {resource_uri}")
-                print("No content available.")
+            if content is not None:
+                self._emit(on_event, {"type": "resource", "uri": resource_uri, "content": content})
+                return content
+            logger.warning("No content available for resource: %s", resource_uri)
+            self._emit(on_event, {"type": "error", "content": "No content available."})
         except Exception as e:
-            logger.error(f"Error reading resource: {e}")
-            print(f"Error: {e}")
+            logger.error("Error reading resource: %s", e)
+            self.supervisor.report_failure(self.session_servers.get(session))
+            self._emit(on_event, {"type": "error", "content": f"Error: {e}"})
+        return None
     
-    async def list_prompts(self):
-        """List all available prompts."""
-        logger.info("Listing prompts")
+    def format_prompts(self):
+        """Describe the available prompts and their arguments as text."""
         if not self.available_prompts:
-            print("No prompts available.")
-            return
+            return "No prompts available."
         
-        print("\nAvailable prompts:")
+        lines = ["Available prompts:"]
         for prompt in self.available_prompts:
-            print(f"- {prompt['name']}: {prompt['description']}")
+            lines.append(f"- {prompt['name']}: {prompt['description']}")
             if prompt['arguments']:
-                print(f"  Arguments:")
+                lines.append("  Arguments:")
                 for arg in prompt['arguments']:
                     arg_name = arg.name if hasattr(arg, 'name') else arg.get('name', '')
-                    print(f"    - {arg_name}")
+                    lines.append(f"    - {arg_name}")
+        return "\n".join(lines)
+    
+    async def list_prompts(self, on_event=None):
+        """List all available prompts as a {"type": "prompts", "content"} event."""
+        logger.info("Listing prompts")
+        content = self.format_prompts()
+        self._emit(on_event, {"type": "prompts", "content": content})
+        return content
     
-    async def execute_prompt(self, prompt_name, args):
-        """Execute a prompt with the given arguments."""
-        logger.info(f"Executing prompt: {prompt_name} with args: {args}")
+    async def execute_prompt(self, prompt_name, args, stream=False, on_event=None):
+        """
+        Execute a prompt with the given arguments.
+        
+        Emits {"type": "prompt", "name"} once the prompt text is fetched, then
+        the same events as process_query.
+        
+        Returns:
+            The final assistant answer, or None if the prompt could not be run
+        """
+        logger.info("Executing prompt: %s", prompt_name)
+        log_payload("Prompt arguments", args)
         session = self.sessions.get(prompt_name)
         if not session:
-            logger.error(f"Prompt '{prompt_name}' not found.")
-            print(f"Prompt '{prompt_name}' not found.")
-            return
+            logger.error("Prompt '%s' not found.", prompt_name)
+            self._emit(on_event, {"type": "error", "content": f"Prompt '{prompt_name}' not found."})
+            return None
         
         try:
-            logger.info(f"Getting prompt: {prompt_name}")
-            result = await session.get_prompt(prompt_name, arguments=args)
-            logger.debug(f"Prompt result: {result}")
-            
-            if result and hasattr(result, 'messages') and result.messages:
-                prompt_content = result.messages[0].content
-                
-                # Extract text from content (handles different formats)
-                if isinstance(prompt_content, str):
-                    text = prompt_content
-                elif hasattr(prompt_content, 'text'):
-                    text = prompt_content.text
-                else:
-                    # Handle list of content items
-                    text = " ".join(item.text if hasattr(item, 'text') else str(item) 
-                                  for item in prompt_content)
-                
-                print(f"\nExecuting prompt '{prompt_name}'...")
-                await self.process_query(text)
-            else:
-                logger.warning(f"No messages in prompt result: {result}")
-                print(f"No content available for prompt: {prompt_name}")
+            logger.info("Getting prompt: %s", prompt_name)
+            with span("mcp_get_prompt", server=self.session_servers.get(session), prompt=prompt_name):
+                result = await session.get_prompt(prompt_name, arguments=args)
+            log_payload("Prompt result", result)
         except Exception as e:
-            logger.error(f"Error executing prompt: {e}")
-            print(f"Error: {e}")
+            logger.error("Error executing prompt: %s", e)
+            self._emit(on_event, {"type": "error", "content": f"Error: {e}"})
+            return None
+        
+        if not (result and hasattr(result, 'messages') and result.messages):
+            logger.warning("No messages in result of prompt %s", prompt_name)
+            self._emit(on_event, {"type": "error", "content": f"No content available for prompt: {prompt_name}"})
+            return None
+        
+        prompt_content = result.messages[0].content
+        
+        # Extract text from content (handles different formats)
+        if isinstance(prompt_content, str):
+            text = prompt_content
+        elif hasattr(prompt_content, 'text'):
+            text = prompt_content.text
+        else:
+            # Handle list of content items
+            text = " ".join(item.text if hasattr(item, 'text') else str(item) 
+                          for item in prompt_content)
+        
+        self._emit(on_event, {"type": "prompt", "name": prompt_name})
+        return await self.process_query(text, stream=stream, on_event=on_event)
+    
+    async def metrics_text(self):
+        """
+        Prometheus metrics of this process followed by those of every server
+        that exposes a metrics:// resource.
+        """
+        parts = [metrics.render()]
+        for uri, session in list(self.sessions.items()):
+            if not uri.startswith("metrics://"):
+                continue
+            try:
+                content = await self._read_resource(session, uri)
+            except Exception as e:
+                logger.warning("Error reading %s: %s", uri, e)
+                continue
+            if content:
+                parts.append(content)
+        return "".join(parts)
     
     async def chat_loop(self):
         print("\nMCP Chatbot Started with OpenAI GPT-4o!")
@@ -471,12 +901,14 @@ class MCP_ChatBot:
                 await self.process_query(query)
                     
             except Exception as e:
-                logger.error(f"Error in chat loop: {e}")
+                logger.error("Error in chat loop: %s", e)
                 print(f"\nError: {str(e)}")
     
     async def cleanup(self):
         logger.info("Cleaning up resources")
-        await self.exit_stack.aclose()
+        await self.supervisor.close()
+        if isinstance(self.openai, AsyncOpenAI):
+            await self.openai.close()
 
 
 async def main():
@@ -488,6 +920,8 @@ async def main():
         # Print debug information
         print("\n=== Debug Information ===")
         print(f"Connected servers: {len(chatbot.sessions)}")
+        for server_name, timing in chatbot.server_timings.items():
+            print(f"  - {server_name}: {timing['status']} in {timing['seconds']}s")
         print(f"Available tools: {len(chatbot.available_tools)}")
         for tool in chatbot.available_tools:
             print(f"  - {tool['function']['name']}: {tool['function']['description']}")
@@ -502,4 +936,5 @@ async def main():
 
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
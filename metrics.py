@@ -0,0 +1,269 @@
+"""
+Timing spans and latency summaries, rendered in the Prometheus text format.
+
+Code under measurement opens a span:
+
+    with span("mcp_tool_call", server="research", tool="extract_info"):
+        result = await session.call_tool(...)
+
+Each span adds its duration to the <name>_seconds summary for its labels and,
+if it raised or was marked with fail(), to <name>_errors_total. Spans opened
+inside another span (including in tasks started from it) inherit its trace
+ID, so every stage of one chat turn can be found in the recent spans. The
+trace ID and the span's parent are recorded there, not used as labels, to
+keep the number of time series small.
+
+Quantiles (p50/p95/p99) are computed over the last METRICS_WINDOW samples of
+each series; counts, sums and error totals cover the whole process lifetime.
+
+Configuration (environment variables):
+    METRICS_ENABLED: set to 0 to turn all spans and observations into no-ops
+    METRICS_WINDOW: samples per series kept for quantiles (default 1024)
+    METRICS_RECENT_SPANS: finished spans kept for inspection (default 200)
+"""
+
+import functools
+import inspect
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger('metrics')
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Labels are stored as a sorted tuple of (name, value) pairs
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _label_set(labels: dict) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: LabelSet, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Summary:
+    """Count, sum and a sliding window of samples for one label set."""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return float("nan")
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Span:
+    """One timed operation; use via Metrics.span."""
+
+    def __init__(self, metrics: "Metrics", name: str, labels: dict, attributes: dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.attributes = attributes
+        self.failed = False
+        self.duration = None
+        self.span_id = uuid.uuid4().hex[:8]
+        self.trace_id = None
+        self.parent = None
+        self._start = None
+        self._token = None
+
+    def fail(self) -> None:
+        """Count this span as an error even though it did not raise."""
+        self.failed = True
+
+    def set(self, **attributes) -> None:
+        """Add attributes to the span record (not to its labels)."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        self.parent = parent.name if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self._token = _current_span.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.failed = True
+            self.attributes.setdefault('error', exc_type.__name__)
+        self.metrics.record_span(self)
+        return False
+
+
+class _NoopSpan:
+    failed = False
+    duration = None
+    trace_id = None
+
+    def fail(self) -> None:
+        pass
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_NOOP_SPAN = _NoopSpan()
+
+
+class Metrics:
+    """Thread-safe registry of summaries and counters fed by spans."""
+
+    def __init__(self, enabled: Optional[bool] = None, window: Optional[int] = None,
+                 recent_spans: Optional[int] = None):
+        self.enabled = enabled if enabled is not None else os.environ.get("METRICS_ENABLED", "1") != "0"
+        self.window = window or int(os.environ.get("METRICS_WINDOW", "1024"))
+        self.summaries: Dict[str, Dict[LabelSet, Summary]] = {}
+        self.counters: Dict[str, Dict[LabelSet, float]] = {}
+        self.recent = deque(maxlen=recent_spans or int(os.environ.get("METRICS_RECENT_SPANS", "200")))
+        self._lock = threading.Lock()
+
+    def span(self, name: str, attributes: Optional[dict] = None, **labels):
+        """
+        Time a block of code.
+
+        Args:
+            name: Metric base name; durations go to <name>_seconds
+            attributes: Extra details kept with the span record only
+            **labels: Labels of the summary, e.g. server and tool names
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, labels, dict(attributes or {}))
+
+    def timed(self, name: str, **labels):
+        """Decorator wrapping every call of a function (sync or async) in a span."""
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_span(self, span: Span) -> None:
+        self.observe(f"{span.name}_seconds", span.duration, **span.labels)
+        if span.failed:
+            self.increment(f"{span.name}_errors_total", **span.labels)
+        else:
+            # Create the series at zero so error rates can be computed before the first error
+            self.increment(f"{span.name}_errors_total", 0, **span.labels)
+        record = {
+            'name': span.name,
+            'trace_id': span.trace_id,
+            'span_id': span.span_id,
+            'parent': span.parent,
+            'duration_ms': round(span.duration * 1000, 3),
+            'error': span.failed,
+            'labels': span.labels,
+            'attributes': span.attributes
+        }
+        self.recent.append(record)
+        logger.debug("Span %s %sms %s %s", span.name, record['duration_ms'], span.labels, span.attributes)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Add a sample (a duration, a token count, ...) to a summary."""
+        if not self.enabled:
+            return
+        key = _label_set(labels)
+        with self._lock:
+            series = self.summaries.setdefault(name, {})
+            summary = series.get(key)
+            if summary is None:
+                summary = series[key] = Summary(self.window)
+            summary.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels) -> None:
+        """Add to a counter; counter names should end in _total."""
+        if not self.enabled:
+            return
+        key = _label_set(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted(self.summaries):
+                lines.append(f"# TYPE {name} summary")
+                for labels, summary in sorted(self.summaries[name].items()):
+                    for q in QUANTILES:
+                        lines.append(f"{name}{_format_labels(labels, ('quantile', str(q)))} "
+                                     f"{_format_value(summary.quantile(q))}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(summary.total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {summary.count}")
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(self.counters[name].items()):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def recent_spans(self, trace_id: Optional[str] = None) -> List[dict]:
+        """Finished spans, oldest first, optionally only those of one trace."""
+        with self._lock:
+            spans = list(self.recent)
+        return [span for span in spans if trace_id is None or span['trace_id'] == trace_id]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.summaries.clear()
+            self.counters.clear()
+            self.recent.clear()
+
+
+# Process-wide registry used by the chatbot, the web app and the servers
+metrics = Metrics()
+span = metrics.span
+timed = metrics.timed
+observe = metrics.observe
+increment = metrics.increment
@@ -0,0 +1,1043 @@
+"""
+Storage backends for the research server's paper store.
+
+Two layouts are supported:
+
+- ``json``: one ``papers/<topic>/papers_info.json`` file per topic (the
+  original layout). Recent writes go to ``papers_info.journal.jsonl`` next
+  to it and are folded into ``papers_info.json`` only on compaction, so
+  readers of the files themselves, such as the filesystem server, must
+  replay the journal on top of ``papers_info.json`` to see every paper.
+- ``sqlite``: a single SQLite database in WAL mode with indexed tables for
+  papers, authors and topic membership.
+
+The backend is picked with the ``PAPER_STORE`` environment variable. Run
+``python paper_store.py migrate`` to import an existing ``papers/`` tree into
+the SQLite database.
+
+Both backends keep a persistent SQLite FTS5 index over title, authors and
+summary so saved papers can be searched without another arXiv round-trip.
+"""
+
+import argparse
+import functools
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+else:
+    msvcrt = None
+
+PAPER_DIR = "papers"
+DEFAULT_DB_PATH = os.path.join(PAPER_DIR, "papers.db")
+SEARCH_INDEX_FILE = "search_index.db"
+
+
+def _synchronized(method):
+    """Serialize calls to a method on the instance's re-entrant lock."""
+    @functools.wraps(method)
+    def wrapped(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapped
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class FullTextIndex:
+    """
+    BM25-ranked full-text index over paper title, authors and summary.
+
+    Documents are (topic, paper ID) pairs stored in an FTS5 table. The
+    fts_docs table maps them to FTS rowids so single papers or whole topics
+    can be replaced without scanning the index.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS fts_docs (
+            doc_id INTEGER PRIMARY KEY,
+            topic TEXT NOT NULL,
+            paper_id TEXT NOT NULL,
+            UNIQUE (topic, paper_id)
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+            title, authors, summary, tokenize = 'porter unicode61'
+        );
+        CREATE TABLE IF NOT EXISTS fts_topics (
+            topic TEXT PRIMARY KEY,
+            version TEXT
+        );
+    """
+
+    # Column weights for bm25(): matches in the title count the most
+    WEIGHTS = (10.0, 5.0, 1.0)
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self.conn() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.db_path)
+        return conn
+
+    def is_empty(self) -> bool:
+        return self.conn().execute("SELECT 1 FROM fts_docs LIMIT 1").fetchone() is None
+
+    def add(self, conn: sqlite3.Connection, topic_dir: str, papers: Dict[str, dict]) -> None:
+        """Index or re-index papers of a topic inside the caller's transaction."""
+        for paper_id, paper_info in papers.items():
+            conn.execute(
+                "INSERT OR IGNORE INTO fts_docs (topic, paper_id) VALUES (?, ?)",
+                (topic_dir, paper_id),
+            )
+            (doc_id,) = conn.execute(
+                "SELECT doc_id FROM fts_docs WHERE topic = ? AND paper_id = ?",
+                (topic_dir, paper_id),
+            ).fetchone()
+            conn.execute("DELETE FROM papers_fts WHERE rowid = ?", (doc_id,))
+            conn.execute(
+                "INSERT INTO papers_fts (rowid, title, authors, summary) VALUES (?, ?, ?, ?)",
+                (
+                    doc_id,
+                    paper_info.get('title') or "",
+                    ", ".join(paper_info.get('authors', [])),
+                    paper_info.get('summary') or "",
+                ),
+            )
+
+    def remove_topic(self, conn: sqlite3.Connection, topic_dir: str) -> None:
+        conn.execute(
+            "DELETE FROM papers_fts WHERE rowid IN (SELECT doc_id FROM fts_docs WHERE topic = ?)",
+            (topic_dir,),
+        )
+        conn.execute("DELETE FROM fts_docs WHERE topic = ?", (topic_dir,))
+        conn.execute("DELETE FROM fts_topics WHERE topic = ?", (topic_dir,))
+
+    def topic_versions(self) -> Dict[str, str]:
+        return dict(self.conn().execute("SELECT topic, version FROM fts_topics"))
+
+    def topic_version(self, topic_dir: str) -> Optional[str]:
+        """The file version a topic was last indexed at, or None if it is not indexed."""
+        row = self.conn().execute("SELECT version FROM fts_topics WHERE topic = ?", (topic_dir,)).fetchone()
+        return row[0] if row else None
+
+    def replace_topic(self, topic_dir: str, papers: Dict[str, dict], version: str) -> None:
+        """Re-index a whole topic and remember which file version was indexed."""
+        conn = self.conn()
+        with conn:
+            self.remove_topic(conn, topic_dir)
+            self.add(conn, topic_dir, papers)
+            conn.execute(
+                "INSERT INTO fts_topics (topic, version) VALUES (?, ?)",
+                (topic_dir, version),
+            )
+
+    def drop_topic(self, topic_dir: str) -> None:
+        conn = self.conn()
+        with conn:
+            self.remove_topic(conn, topic_dir)
+
+    @staticmethod
+    def _match_expression(query: str) -> str:
+        # Quote every term so user input can never be parsed as FTS5 syntax
+        terms = re.findall(r"\w+", query.lower())
+        return " OR ".join(f'"{term}"' for term in terms)
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """
+        Return the best matching papers, most relevant first.
+
+        Each hit has the paper ID, its topic, a BM25 score (lower is better)
+        and a highlighted snippet of the summary.
+        """
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+        rows = self.conn().execute(
+            "SELECT d.paper_id, d.topic, bm25(papers_fts, ?, ?, ?) AS score, "
+            "snippet(papers_fts, 2, '**', '**', '...', 24) "
+            "FROM papers_fts JOIN fts_docs d ON d.doc_id = papers_fts.rowid "
+            "WHERE papers_fts MATCH ? ORDER BY score LIMIT ?",
+            (*self.WEIGHTS, expression, limit * 4),
+        )
+        hits = []
+        seen = set()
+        # The same paper can be saved under several topics; keep its best hit
+        for paper_id, topic_dir, score, snippet in rows:
+            if paper_id in seen:
+                continue
+            seen.add(paper_id)
+            hits.append({
+                'paper_id': paper_id,
+                'topic': topic_dir,
+                'score': round(score, 4),
+                'snippet': snippet
+            })
+            if len(hits) == limit:
+                break
+        return hits
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class PaperStore:
+    """Interface shared by all paper store backends."""
+
+    def refresh(self) -> None:
+        """Synchronize any in-memory state with the underlying storage."""
+
+    def add_papers(self, topic_dir: str, papers: Dict[str, dict]) -> None:
+        """Add or update papers (paper ID -> paper info) under a topic."""
+        raise NotImplementedError
+
+    def get_paper(self, paper_id: str) -> Optional[dict]:
+        """Return the stored info for a paper ID, or None if it is unknown."""
+        raise NotImplementedError
+
+    def get_papers(self, paper_ids: List[str]) -> Dict[str, Optional[dict]]:
+        """Return the stored info for several paper IDs (None for unknown ones), in one pass."""
+        return {paper_id: self.get_paper(paper_id) for paper_id in paper_ids}
+
+    def get_topic(self, topic_dir: str) -> Optional[Dict[str, dict]]:
+        """Return all papers of a topic, or None if the topic does not exist."""
+        raise NotImplementedError
+
+    def get_topic_page(self, topic_dir: str, offset: int, limit: int) -> Optional[Tuple[int, Dict[str, dict]]]:
+        """
+        Return (total papers, papers in [offset, offset + limit)) for a topic,
+        or None if the topic does not exist.
+        """
+        papers = self.get_topic(topic_dir)
+        if papers is None:
+            return None
+        paper_ids = itertools.islice(papers, offset, offset + limit)
+        return len(papers), {paper_id: papers[paper_id] for paper_id in paper_ids}
+
+    def topic_version(self, topic_dir: str) -> Optional[str]:
+        """
+        Return an opaque token that changes whenever a topic's papers change,
+        or None if the topic does not exist. Only this topic is checked (two
+        stat calls or one indexed query), never the whole store.
+        """
+        raise NotImplementedError
+
+    def list_topics(self) -> List[str]:
+        """Return the names of all topics that have stored papers."""
+        raise NotImplementedError
+
+    def topic_catalog(self) -> List[dict]:
+        """
+        Return one entry per topic with its paper count, stored size in bytes
+        and last-updated time (epoch seconds), sorted by topic name.
+        """
+        raise NotImplementedError
+
+    def location(self, topic_dir: str) -> str:
+        """Describe where the papers of a topic are stored."""
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """
+        Full-text search over all stored papers, most relevant first.
+
+        Each hit contains the paper ID, topic, BM25 score, highlighted summary
+        snippet and the stored title, authors and publication date.
+        """
+        hits = self.search_index.search(query, limit)
+        papers = self.get_papers([hit['paper_id'] for hit in hits])
+        for hit in hits:
+            paper_info = papers.get(hit['paper_id']) or {}
+            hit['title'] = paper_info.get('title')
+            hit['authors'] = paper_info.get('authors', [])
+            hit['published'] = paper_info.get('published')
+        return hits
+
+    def close(self) -> None:
+        """Release any resources held by the store."""
+
+
+class JsonPaperStore(PaperStore):
+    """
+    Paper store backed by one papers_info.json file per topic directory.
+
+    Writes append the new or changed papers to a per-topic JSON Lines journal under an
+    exclusive file lock, so they cost O(new papers) and concurrent writers
+    (threads or processes) never lose each other's papers. Once the journal
+    grows past PAPER_JOURNAL_MAX entries it is compacted into
+    papers_info.json by writing a temporary file and renaming it over the
+    original, so a crash never leaves a truncated topic file. Readers see
+    papers_info.json with the journal replayed on top.
+
+    Parsed topics are kept in memory together with a paper-ID index, and
+    re-validated against the files' modification times and sizes, so lookups
+    do not parse every topic. The topic catalog is updated whenever a topic
+    is written or re-read. Every write also touches a store-wide marker file,
+    so listing the catalog costs two stat calls until a write happens. Only
+    then are the known topics' file versions re-checked, and the directory
+    is rescanned only when topics were added or removed. The full-text index
+    lives in a sidecar SQLite database. add_papers updates it in place, and
+    searches re-check it against the topic versions only after the write
+    state moved.
+
+    The in-memory state is shared between threads, so public methods hold a
+    lock while they touch it.
+    """
+
+    JOURNAL_FILE = "papers_info.journal.jsonl"
+    LOCK_FILE = ".papers_info.lock"
+    # Touched after every write so readers notice writes by other processes
+    WRITE_MARKER = ".last_write"
+
+    def __init__(self, paper_dir: str = PAPER_DIR):
+        self.paper_dir = paper_dir
+        self.journal_max = int(os.environ.get("PAPER_JOURNAL_MAX", "200"))
+        # topic -> papers_info, topic -> file version, paper ID -> topic
+        self._topics = {}
+        self._versions = {}
+        self._index = {}
+        # topic -> catalog entry, and the write state it reflects
+        self._catalog = {}
+        self._write_state_seen = None
+        # Write state the full-text index was last checked against
+        self._search_state = None
+        self._search_index = None
+        self._lock = threading.RLock()
+
+    @property
+    def search_index(self) -> FullTextIndex:
+        if self._search_index is None:
+            os.makedirs(self.paper_dir, exist_ok=True)
+            self._search_index = FullTextIndex(os.path.join(self.paper_dir, SEARCH_INDEX_FILE))
+        return self._search_index
+
+    def _topic_file(self, topic_dir: str) -> str:
+        return os.path.join(self.paper_dir, topic_dir, "papers_info.json")
+
+    def _journal_file(self, topic_dir: str) -> str:
+        return os.path.join(self.paper_dir, topic_dir, self.JOURNAL_FILE)
+
+    @contextmanager
+    def _file_lock(self, topic_dir: str):
+        """Hold an exclusive lock on a topic across threads and processes."""
+        with open(os.path.join(self.paper_dir, topic_dir, self.LOCK_FILE), "a+") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _version(self, topic_dir: str) -> Optional[str]:
+        """Identify the on-disk state of a topic, or None if it does not exist."""
+        parts = []
+        for file_path in (self._topic_file(topic_dir), self._journal_file(topic_dir)):
+            try:
+                stat = os.stat(file_path)
+                parts.append(f"{stat.st_mtime_ns}-{stat.st_size}")
+            except OSError:
+                parts.append("")
+        return ":".join(parts) if any(parts) else None
+
+    def _read_topic(self, topic_dir: str) -> dict:
+        """Read papers_info.json and replay the topic's journal on top of it."""
+        try:
+            with open(self._topic_file(topic_dir), "r") as json_file:
+                papers_info = json.load(json_file)
+        except FileNotFoundError:
+            papers_info = {}
+
+        try:
+            with open(self._journal_file(topic_dir), "r") as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crashed writer
+                        continue
+                    papers_info[entry['paper_id']] = entry['paper_info']
+        except FileNotFoundError:
+            pass
+        return papers_info
+
+    def _has_torn_line(self, topic_dir: str) -> bool:
+        """Whether the journal is non-empty and does not end in a newline."""
+        try:
+            with open(self._journal_file(topic_dir), "rb") as journal:
+                journal.seek(0, os.SEEK_END)
+                if journal.tell() == 0:
+                    return False
+                journal.seek(-1, os.SEEK_END)
+                return journal.read(1) != b"\n"
+        except FileNotFoundError:
+            return False
+
+    def _journal_length(self, topic_dir: str) -> int:
+        try:
+            with open(self._journal_file(topic_dir), "rb") as journal:
+                return sum(1 for _ in journal)
+        except FileNotFoundError:
+            return 0
+
+    def _compact(self, topic_dir: str) -> None:
+        """Fold the journal into papers_info.json. The caller holds the file lock."""
+        papers_info = self._read_topic(topic_dir)
+        file_path = self._topic_file(topic_dir)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "w") as json_file:
+            json.dump(papers_info, json_file, indent=2)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(tmp_path, file_path)
+        # Replaying the journal is idempotent, so a crash before this point
+        # only means the same entries get applied again
+        os.remove(self._journal_file(topic_dir))
+
+    def _index_topic(self, topic_dir: str, papers_info: dict, version: str) -> None:
+        """Replace the cached papers of a topic and update the index."""
+        for paper_id in self._topics.get(topic_dir, {}).keys() - papers_info.keys():
+            if self._index.get(paper_id) == topic_dir:
+                del self._index[paper_id]
+        for paper_id in papers_info:
+            self._index[paper_id] = topic_dir
+        self._topics[topic_dir] = papers_info
+        self._versions[topic_dir] = version
+        self._catalog[topic_dir] = self._catalog_entry(topic_dir, papers_info)
+
+    def _drop_topic(self, topic_dir: str) -> None:
+        for paper_id in self._topics.pop(topic_dir, {}):
+            if self._index.get(paper_id) == topic_dir:
+                del self._index[paper_id]
+        self._versions.pop(topic_dir, None)
+        self._catalog.pop(topic_dir, None)
+
+    def _catalog_entry(self, topic_dir: str, papers_info: dict) -> dict:
+        size_bytes = 0
+        updated = 0.0
+        for file_path in (self._topic_file(topic_dir), self._journal_file(topic_dir)):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            size_bytes += stat.st_size
+            updated = max(updated, stat.st_mtime)
+        return {
+            'topic': topic_dir,
+            'papers': len(papers_info),
+            'size_bytes': size_bytes,
+            'updated': updated
+        }
+
+    def _write_state(self) -> Optional[Tuple[int, Optional[int]]]:
+        """The papers directory and write marker mtimes, or None if there is no papers directory."""
+        try:
+            dir_mtime = os.stat(self.paper_dir).st_mtime_ns
+        except OSError:
+            return None
+        try:
+            marker_mtime = os.stat(os.path.join(self.paper_dir, self.WRITE_MARKER)).st_mtime_ns
+        except OSError:
+            marker_mtime = None
+        return dir_mtime, marker_mtime
+
+    def _touch_write_marker(self) -> None:
+        marker = os.path.join(self.paper_dir, self.WRITE_MARKER)
+        with open(marker, "a"):
+            pass
+        os.utime(marker)
+
+    def _revalidate(self) -> Optional[Tuple[int, Optional[int]]]:
+        """
+        Pick up writes made since the last call and return the current write
+        state. Topics are added or removed as directories, which changes the
+        papers directory's mtime; writes to existing topics only move the
+        write marker, so then just the known topics are re-checked.
+        """
+        state = self._write_state()
+        if state is None or state == self._write_state_seen:
+            return state
+        if self._write_state_seen is None or state[0] != self._write_state_seen[0]:
+            self.refresh()
+        else:
+            for topic_dir in list(self._versions):
+                if self._is_current(topic_dir):
+                    continue
+                try:
+                    self._load_topic(topic_dir)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"Error reading {self._topic_file(topic_dir)}: {str(e)}")
+        self._write_state_seen = state
+        return state
+
+    def _is_current(self, topic_dir: str) -> bool:
+        return self._version(topic_dir) == self._versions.get(topic_dir)
+
+    def _load_topic(self, topic_dir: str) -> Optional[dict]:
+        """Return the papers of a topic, re-reading the files only if they changed."""
+        version = self._version(topic_dir)
+        if version is None:
+            self._drop_topic(topic_dir)
+            return None
+        if topic_dir in self._topics and self._versions.get(topic_dir) == version:
+            return self._topics[topic_dir]
+
+        papers_info = self._read_topic(topic_dir)
+        self._index_topic(topic_dir, papers_info, version)
+        return papers_info
+
+    @_synchronized
+    def refresh(self) -> None:
+        """
+        Bring the in-memory index in line with the files on disk.
+
+        Only topics whose files are new or changed are re-parsed; unchanged
+        topics cost two stat calls.
+        """
+        seen = set()
+        if os.path.isdir(self.paper_dir):
+            for item in os.listdir(self.paper_dir):
+                version = self._version(item)
+                if version is None:
+                    continue
+                seen.add(item)
+                if self._versions.get(item) == version:
+                    continue
+                try:
+                    papers_info = self._read_topic(item)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"Error reading {self._topic_file(item)}: {str(e)}")
+                    continue
+                self._index_topic(item, papers_info, version)
+
+        for topic_dir in set(self._versions) - seen:
+            self._drop_topic(topic_dir)
+
+    def _sync_search_index(self) -> None:
+        """Re-index topics whose files changed since they were last indexed."""
+        indexed = self.search_index.topic_versions()
+        for topic_dir, version in self._versions.items():
+            if indexed.get(topic_dir) != version:
+                self.search_index.replace_topic(topic_dir, self._topics[topic_dir], version)
+        for topic_dir in indexed.keys() - self._versions.keys():
+            self.search_index.drop_topic(topic_dir)
+
+    @_synchronized
+    def add_papers(self, topic_dir: str, papers: Dict[str, dict]) -> None:
+        os.makedirs(os.path.join(self.paper_dir, topic_dir), exist_ok=True)
+
+        with self._file_lock(topic_dir):
+            # Re-read the topic only if someone else wrote it since we last
+            # did; the cached copy plus the new papers is then exactly what
+            # ends up on disk
+            stored = self._load_topic(topic_dir)
+            if stored is None:
+                stored = {}
+            previous_version = self._versions.get(topic_dir)
+            # Records identical to the stored ones, e.g. from a repeated
+            # search answered by the query cache, need no write
+            papers = {
+                paper_id: paper_info for paper_id, paper_info in papers.items()
+                if stored.get(paper_id) != paper_info
+            }
+            if not papers:
+                return
+
+            with open(self._journal_file(topic_dir), "a") as journal:
+                if self._has_torn_line(topic_dir):
+                    # Terminate a crashed writer's partial line, or this
+                    # entry would be glued onto it and skipped by readers
+                    journal.write("\n")
+                journal.write("".join(
+                    json.dumps({'paper_id': paper_id, 'paper_info': paper_info}) + "\n"
+                    for paper_id, paper_info in papers.items()
+                ))
+
+            if self._journal_length(topic_dir) > self.journal_max:
+                self._compact(topic_dir)
+            version = self._version(topic_dir)
+            stored.update(papers)
+            self._index_topic(topic_dir, stored, version)
+            self._touch_write_marker()
+
+        # Only the new papers need indexing if the index already holds the
+        # topic as it was before this write; recording the new file version
+        # then keeps the next refresh from re-indexing the whole topic
+        if self.search_index.topic_version(topic_dir) == previous_version:
+            conn = self.search_index.conn()
+            with conn:
+                self.search_index.add(conn, topic_dir, papers)
+                conn.execute(
+                    "INSERT OR REPLACE INTO fts_topics (topic, version) VALUES (?, ?)",
+                    (topic_dir, version),
+                )
+        else:
+            self.search_index.replace_topic(topic_dir, self._topics[topic_dir], version)
+
+    def _indexed_topic(self, topic_dir: str) -> Dict[str, dict]:
+        """Papers of an indexed topic, re-reading only that topic if it changed."""
+        try:
+            return self._load_topic(topic_dir) or {}
+        except (OSError, json.JSONDecodeError) as e:
+            # Serve the last good copy; a refresh would skip the topic anyway
+            print(f"Error reading {self._topic_file(topic_dir)}: {str(e)}")
+            return self._topics.get(topic_dir, {})
+
+    @_synchronized
+    def get_paper(self, paper_id: str) -> Optional[dict]:
+        topic_dir = self._index.get(paper_id)
+        if topic_dir is not None:
+            paper = self._indexed_topic(topic_dir).get(paper_id)
+            if paper is not None:
+                return paper
+
+        # Unknown ID, or it left its topic: pick up writes made since the
+        # last check, which costs two stat calls when there were none
+        self._revalidate()
+        topic_dir = self._index.get(paper_id)
+        return self._topics[topic_dir].get(paper_id) if topic_dir is not None else None
+
+    @_synchronized
+    def get_papers(self, paper_ids: List[str]) -> Dict[str, Optional[dict]]:
+        papers = {}
+        topics = {}
+        missing = []
+        for paper_id in paper_ids:
+            topic_dir = self._index.get(paper_id)
+            if topic_dir is not None:
+                if topic_dir not in topics:
+                    topics[topic_dir] = self._indexed_topic(topic_dir)
+                if paper_id in topics[topic_dir]:
+                    papers[paper_id] = topics[topic_dir][paper_id]
+                    continue
+            missing.append(paper_id)
+
+        if missing:
+            # One revalidation covers every ID not found in its indexed topic
+            self._revalidate()
+            for paper_id in missing:
+                topic_dir = self._index.get(paper_id)
+                papers[paper_id] = self._topics[topic_dir].get(paper_id) if topic_dir is not None else None
+        return {paper_id: papers[paper_id] for paper_id in paper_ids}
+
+    @_synchronized
+    def get_topic(self, topic_dir: str) -> Optional[Dict[str, dict]]:
+        # A copy, since add_papers updates the cached dict on other threads
+        papers = self._load_topic(topic_dir)
+        return dict(papers) if papers is not None else None
+
+    @_synchronized
+    def get_topic_page(self, topic_dir: str, offset: int, limit: int) -> Optional[Tuple[int, Dict[str, dict]]]:
+        # add_papers updates the cached topic dict in place, so slice it
+        # while holding the lock rather than after get_topic returns
+        papers = self._load_topic(topic_dir)
+        if papers is None:
+            return None
+        paper_ids = itertools.islice(papers, offset, offset + limit)
+        return len(papers), {paper_id: papers[paper_id] for paper_id in paper_ids}
+
+    def topic_version(self, topic_dir: str) -> Optional[str]:
+        return self._version(topic_dir)
+
+    def list_topics(self) -> List[str]:
+        return [entry['topic'] for entry in self.topic_catalog()]
+
+    @_synchronized
+    def topic_catalog(self) -> List[dict]:
+        if self._revalidate() is None:
+            return []
+        return [self._catalog[topic_dir] for topic_dir in sorted(self._catalog)]
+
+    def location(self, topic_dir: str) -> str:
+        return self._topic_file(topic_dir)
+
+    @_synchronized
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        # add_papers keeps the index current for its own writes; topics are
+        # only re-checked against it after the write state moved
+        state = self._revalidate()
+        if state != self._search_state:
+            self._sync_search_index()
+            self._search_state = state
+        return super().search(query, limit)
+
+    @_synchronized
+    def close(self) -> None:
+        if self._search_index is not None:
+            self._search_index.close()
+
+
+class SqlitePaperStore(PaperStore):
+    """
+    Paper store backed by a SQLite database in WAL mode.
+
+    Papers, their authors and topic membership live in separate indexed
+    tables, so adding papers only writes the new rows and reads never parse
+    whole topic files. The full-text index shares the database and is updated
+    in the same transaction. Each thread gets its own connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS papers (
+            paper_id TEXT PRIMARY KEY,
+            title TEXT,
+            summary TEXT,
+            pdf_url TEXT,
+            published TEXT
+        );
+        CREATE TABLE IF NOT EXISTS authors (
+            paper_id TEXT NOT NULL REFERENCES papers(paper_id),
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            PRIMARY KEY (paper_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_authors_name ON authors(name);
+        CREATE TABLE IF NOT EXISTS topic_papers (
+            topic TEXT NOT NULL,
+            paper_id TEXT NOT NULL REFERENCES papers(paper_id),
+            PRIMARY KEY (topic, paper_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_topic_papers_paper ON topic_papers(paper_id);
+        CREATE TABLE IF NOT EXISTS topics (
+            topic TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL,
+            paper_count INTEGER NOT NULL DEFAULT 0,
+            size_bytes INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    # Recomputes the catalog columns of topics rows selected by a WHERE
+    # clause from scratch; add_papers applies deltas instead
+    UPDATE_TOPICS = """
+        UPDATE topics SET
+            version = version + 1,
+            updated_at = ?,
+            paper_count = (
+                SELECT COUNT(*) FROM topic_papers tp WHERE tp.topic = topics.topic
+            ),
+            size_bytes = (
+                SELECT COALESCE(SUM(LENGTH(p.title) + LENGTH(p.summary)
+                                    + LENGTH(p.pdf_url) + LENGTH(p.published)), 0)
+                FROM topic_papers tp JOIN papers p ON p.paper_id = tp.paper_id
+                WHERE tp.topic = topics.topic
+            )
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.executescript(self.SCHEMA)
+            # Databases created before the topics table had catalog columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(topics)")}
+            for column in ("paper_count", "size_bytes"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE topics ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+            # Databases created before the topics table existed
+            conn.execute(
+                "INSERT OR IGNORE INTO topics (topic) SELECT DISTINCT topic FROM topic_papers"
+            )
+            conn.execute(self.UPDATE_TOPICS + " WHERE paper_count = 0", (time.time(),))
+        self.search_index = FullTextIndex(db_path)
+        if self.search_index.is_empty():
+            # Databases created before the full-text index existed
+            for topic_dir in self.list_topics():
+                self.search_index.replace_topic(topic_dir, self.get_topic(topic_dir), "")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.db_path)
+        return conn
+
+    def _authors(self, conn: sqlite3.Connection, paper_ids: List[str]) -> Dict[str, List[str]]:
+        authors = {paper_id: [] for paper_id in paper_ids}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(paper_ids), 500):
+            chunk = paper_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT paper_id, name FROM authors WHERE paper_id IN ({placeholders}) "
+                "ORDER BY paper_id, position",
+                chunk,
+            )
+            for paper_id, name in rows:
+                authors[paper_id].append(name)
+        return authors
+
+    @staticmethod
+    def _paper_info(row, authors: List[str]) -> dict:
+        title, summary, pdf_url, published = row
+        return {
+            'title': title,
+            'authors': authors,
+            'summary': summary,
+            'pdf_url': pdf_url,
+            'published': published
+        }
+
+    # Stored size of one paper as counted in topics.size_bytes
+    PAPER_SIZE = (
+        "SELECT LENGTH(title) + LENGTH(summary) + LENGTH(pdf_url) + LENGTH(published) "
+        "FROM papers WHERE paper_id = ?"
+    )
+
+    def _paper_size(self, conn: sqlite3.Connection, paper_id: str) -> int:
+        row = conn.execute(self.PAPER_SIZE, (paper_id,)).fetchone()
+        return (row[0] or 0) if row else 0
+
+    def add_papers(self, topic_dir: str, papers: Dict[str, dict]) -> None:
+        conn = self._conn()
+        with conn:
+            # Take the write lock before reading the sizes and memberships the
+            # deltas below start from; otherwise two writers adding the same
+            # papers would both count them
+            conn.execute("BEGIN IMMEDIATE")
+            # Papers already in the topic with identical records, e.g. from a
+            # repeated search answered by the query cache, need no write
+            stored = self.get_papers(list(papers))
+            members = {
+                paper_id for paper_id in papers
+                if conn.execute(
+                    "SELECT 1 FROM topic_papers WHERE topic = ? AND paper_id = ?",
+                    (topic_dir, paper_id),
+                ).fetchone()
+            }
+            papers = {
+                paper_id: paper_info for paper_id, paper_info in papers.items()
+                if paper_id not in members or stored[paper_id] != paper_info
+            }
+            if not papers:
+                return
+            # topic -> [paper count change, size change], so the catalog
+            # columns are updated from the written rows alone
+            deltas = {topic_dir: [0, 0]}
+            # topic -> papers whose full-text rows need rewriting
+            reindex = {topic_dir: papers}
+            for paper_id, paper_info in papers.items():
+                old_size = self._paper_size(conn, paper_id)
+                # Papers are shared between topics, so every topic already
+                # containing one of them changes, not just this one
+                member_of = [row[0] for row in conn.execute(
+                    "SELECT topic FROM topic_papers WHERE paper_id = ?", (paper_id,)
+                )]
+                conn.execute(
+                    "INSERT INTO papers (paper_id, title, summary, pdf_url, published) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(paper_id) DO UPDATE SET title=excluded.title, "
+                    "summary=excluded.summary, pdf_url=excluded.pdf_url, "
+                    "published=excluded.published",
+                    (
+                        paper_id,
+                        paper_info.get('title'),
+                        paper_info.get('summary'),
+                        paper_info.get('pdf_url'),
+                        paper_info.get('published'),
+                    ),
+                )
+                conn.execute("DELETE FROM authors WHERE paper_id = ?", (paper_id,))
+                conn.executemany(
+                    "INSERT INTO authors (paper_id, position, name) VALUES (?, ?, ?)",
+                    [(paper_id, i, name) for i, name in enumerate(paper_info.get('authors', []))],
+                )
+                conn.execute(
+                    "INSERT OR IGNORE INTO topic_papers (topic, paper_id) VALUES (?, ?)",
+                    (topic_dir, paper_id),
+                )
+                new_size = self._paper_size(conn, paper_id)
+                for topic in member_of:
+                    deltas.setdefault(topic, [0, 0])[1] += new_size - old_size
+                    if topic != topic_dir:
+                        reindex.setdefault(topic, {})[paper_id] = paper_info
+                if topic_dir not in member_of:
+                    deltas[topic_dir][0] += 1
+                    deltas[topic_dir][1] += new_size
+            for topic, topic_papers in reindex.items():
+                self.search_index.add(conn, topic, topic_papers)
+
+            conn.execute("INSERT OR IGNORE INTO topics (topic) VALUES (?)", (topic_dir,))
+            now = time.time()
+            conn.executemany(
+                "UPDATE topics SET version = version + 1, updated_at = ?, "
+                "paper_count = paper_count + ?, size_bytes = size_bytes + ? WHERE topic = ?",
+                [(now, count, size, topic) for topic, (count, size) in deltas.items()],
+            )
+
+    def get_paper(self, paper_id: str) -> Optional[dict]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT title, summary, pdf_url, published FROM papers WHERE paper_id = ?",
+            (paper_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return self._paper_info(row, self._authors(conn, [paper_id])[paper_id])
+
+    def get_papers(self, paper_ids: List[str]) -> Dict[str, Optional[dict]]:
+        conn = self._conn()
+        unique_ids = list(dict.fromkeys(paper_ids))
+        rows = []
+        for start in range(0, len(unique_ids), 500):
+            chunk = unique_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(conn.execute(
+                "SELECT paper_id, title, summary, pdf_url, published FROM papers "
+                f"WHERE paper_id IN ({placeholders})",
+                chunk,
+            ))
+        authors = self._authors(conn, [row[0] for row in rows])
+        found = {row[0]: self._paper_info(row[1:], authors[row[0]]) for row in rows}
+        return {paper_id: found.get(paper_id) for paper_id in paper_ids}
+
+    def get_topic(self, topic_dir: str) -> Optional[Dict[str, dict]]:
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT p.paper_id, p.title, p.summary, p.pdf_url, p.published "
+            "FROM topic_papers t JOIN papers p ON p.paper_id = t.paper_id "
+            "WHERE t.topic = ? ORDER BY t.rowid",
+            (topic_dir,),
+        ).fetchall()
+        if not rows:
+            return None
+        authors = self._authors(conn, [row[0] for row in rows])
+        return {row[0]: self._paper_info(row[1:], authors[row[0]]) for row in rows}
+
+    def get_topic_page(self, topic_dir: str, offset: int, limit: int) -> Optional[Tuple[int, Dict[str, dict]]]:
+        conn = self._conn()
+        (total,) = conn.execute(
+            "SELECT COUNT(*) FROM topic_papers WHERE topic = ?", (topic_dir,)
+        ).fetchone()
+        if not total:
+            return None
+        rows = conn.execute(
+            "SELECT p.paper_id, p.title, p.summary, p.pdf_url, p.published "
+            "FROM topic_papers t JOIN papers p ON p.paper_id = t.paper_id "
+            "WHERE t.topic = ? ORDER BY t.rowid LIMIT ? OFFSET ?",
+            (topic_dir, limit, offset),
+        ).fetchall()
+        authors = self._authors(conn, [row[0] for row in rows])
+        return total, {row[0]: self._paper_info(row[1:], authors[row[0]]) for row in rows}
+
+    def topic_version(self, topic_dir: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT version FROM topics WHERE topic = ?", (topic_dir,)
+        ).fetchone()
+        return str(row[0]) if row is not None else None
+
+    def list_topics(self) -> List[str]:
+        rows = self._conn().execute("SELECT DISTINCT topic FROM topic_papers ORDER BY topic")
+        return [row[0] for row in rows]
+
+    def topic_catalog(self) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT topic, paper_count, size_bytes, updated_at FROM topics "
+            "WHERE paper_count > 0 ORDER BY topic"
+        )
+        return [
+            {'topic': topic, 'papers': papers, 'size_bytes': size_bytes, 'updated': updated}
+            for topic, papers, size_bytes, updated in rows
+        ]
+
+    def location(self, topic_dir: str) -> str:
+        return f"{self.db_path} (topic: {topic_dir})"
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        self.search_index.close()
+
+
+def get_store(backend: Optional[str] = None) -> PaperStore:
+    """
+    Create the paper store selected by the PAPER_STORE environment variable.
+
+    Args:
+        backend: "json" (default) or "sqlite"; overrides PAPER_STORE if given
+    """
+    backend = (backend or os.environ.get("PAPER_STORE", "json")).lower()
+    if backend == "json":
+        return JsonPaperStore(os.environ.get("PAPER_DIR", PAPER_DIR))
+    if backend == "sqlite":
+        return SqlitePaperStore(os.environ.get("PAPER_DB", DEFAULT_DB_PATH))
+    raise ValueError(f"Unknown paper store backend: {backend}")
+
+
+def migrate(paper_dir: str = PAPER_DIR, db_path: str = DEFAULT_DB_PATH) -> int:
+    """
+    Import every topic of a JSON papers tree into a SQLite store.
+
+    Returns:
+        Number of (topic, paper) entries imported
+    """
+    source = JsonPaperStore(paper_dir)
+    target = SqlitePaperStore(db_path)
+    imported = 0
+    try:
+        for topic_dir in source.list_topics():
+            try:
+                papers = source.get_topic(topic_dir)
+            except json.JSONDecodeError as e:
+                print(f"Skipping {topic_dir}: {str(e)}")
+                continue
+            if papers:
+                target.add_papers(topic_dir, papers)
+                imported += len(papers)
+                print(f"Imported {len(papers)} papers from {topic_dir}")
+    finally:
+        target.close()
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the research paper store")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser(
+        "migrate", help="Import the JSON papers tree into the SQLite store"
+    )
+    migrate_parser.add_argument("--papers-dir", default=PAPER_DIR)
+    migrate_parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    cli_args = parser.parse_args()
+
+    if cli_args.command == "migrate":
+        count = migrate(cli_args.papers_dir, cli_args.db)
+        print(f"Migrated {count} papers into {cli_args.db}")
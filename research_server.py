@@ -1,75 +1,82 @@
-import arxiv
+import asyncio
+import functools
 import json
+import math
 import os
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Union
+from urllib.parse import parse_qs
 from mcp.server.fastmcp import FastMCP
-
-PAPER_DIR = "papers"
+from mcp.types import ToolAnnotations
+from arxiv_client import client_stats, query_cache, search_arxiv
+from metrics import metrics, timed
+from paper_store import get_store
+from ttl_cache import TTLCache
 
 # Initialize FastMCP server
 mcp = FastMCP("research")
 
-@mcp.tool()
-def search_papers(topic: str, max_results: int = 5) -> List[str]:
+# Paper store backend (JSON files per topic or SQLite), see paper_store.py
+store = get_store()
+
+# Bounded pool for blocking arXiv and store I/O, so a slow search does not
+# stall extract_info or resource reads from other clients
+executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("RESEARCH_WORKERS", "8")),
+    thread_name_prefix="research-io"
+)
+
+# Rendered papers://{topic} pages, keyed by (topic, store version, page, size).
+# A write changes the topic's version, so stale pages are simply never hit again.
+render_cache = TTLCache(maxsize=int(os.environ.get("RENDER_CACHE_SIZE", "128")), ttl=3600)
+DEFAULT_PAGE_SIZE = int(os.environ.get("PAPERS_PAGE_SIZE", "20"))
+MAX_PAGE_SIZE = 100
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function on the I/O thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+# search_papers saves what it finds, so clients must not cache around it; the
+# other tools only read the store and may be cached until it changes
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=False, destructiveHint=False, openWorldHint=True))
+@timed("research_tool", tool="search_papers")
+async def search_papers(topic: str, max_results: int = 5,
+                        include_details: bool = False) -> Union[List[str], Dict[str, dict]]:
     """
     Search for papers on arXiv based on a topic and store their information.
     
     Args:
         topic: The topic to search for
         max_results: Maximum number of results to retrieve (default: 5)
+        include_details: Return the full paper records instead of only their IDs,
+            so no extract_info calls are needed afterwards (default: False)
         
     Returns:
-        List of paper IDs found in the search
+        List of paper IDs found in the search, or a dict mapping each paper ID
+        to its information when include_details is set
     """
     
-    # Use arxiv to find the papers 
-    client = arxiv.Client()
-
-    # Search for the most relevant articles matching the queried topic
-    search = arxiv.Search(
-        query = topic,
-        max_results = max_results,
-        sort_by = arxiv.SortCriterion.Relevance
-    )
-
-    papers = client.results(search)
+    # Use arxiv to find the most relevant articles matching the queried topic;
+    # repeated searches are answered from the query cache
+    papers_info = await run_blocking(search_arxiv, topic, max_results, sort_by="relevance")
+    paper_ids = list(papers_info)
+    topic_dir = topic.lower().replace(" ", "_")
     
-    # Create directory for this topic
-    path = os.path.join(PAPER_DIR, topic.lower().replace(" ", "_"))
-    os.makedirs(path, exist_ok=True)
+    # Save the new papers to the store
+    await run_blocking(store.add_papers, topic_dir, papers_info)
     
-    file_path = os.path.join(path, "papers_info.json")
-
-    # Try to load existing papers info
-    try:
-        with open(file_path, "r") as json_file:
-            papers_info = json.load(json_file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        papers_info = {}
-
-    # Process each paper and add to papers_info  
-    paper_ids = []
-    for paper in papers:
-        paper_ids.append(paper.get_short_id())
-        paper_info = {
-            'title': paper.title,
-            'authors': [author.name for author in paper.authors],
-            'summary': paper.summary,
-            'pdf_url': paper.pdf_url,
-            'published': str(paper.published.date())
-        }
-        papers_info[paper.get_short_id()] = paper_info
-    
-    # Save updated papers_info to json file
-    with open(file_path, "w") as json_file:
-        json.dump(papers_info, json_file, indent=2)
-    
-    print(f"Results are saved in: {file_path}")
+    print(f"Results are saved in: {store.location(topic_dir)}")
     
+    if include_details:
+        return papers_info
     return paper_ids
 
-@mcp.tool()
-def extract_info(paper_id: str) -> str:
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True, openWorldHint=False))
+@timed("research_tool", tool="extract_info")
+async def extract_info(paper_id: str) -> str:
     """
     Search for information about a specific paper across all topic directories.
     
@@ -79,86 +86,191 @@ def extract_info(paper_id: str) -> str:
     Returns:
         JSON string with paper information if found, error message if not found
     """
- 
-    for item in os.listdir(PAPER_DIR):
-        item_path = os.path.join(PAPER_DIR, item)
-        if os.path.isdir(item_path):
-            file_path = os.path.join(item_path, "papers_info.json")
-            if os.path.isfile(file_path):
-                try:
-                    with open(file_path, "r") as json_file:
-                        papers_info = json.load(json_file)
-                        if paper_id in papers_info:
-                            return json.dumps(papers_info[paper_id], indent=2)
-                except (FileNotFoundError, json.JSONDecodeError) as e:
-                    print(f"Error reading {file_path}: {str(e)}")
-                    continue
+
+    paper_info = await run_blocking(store.get_paper, paper_id)
+    if paper_info is not None:
+        return json.dumps(paper_info, indent=2)
     
     return f"There's no saved information related to paper {paper_id}."
 
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True, openWorldHint=False))
+@timed("research_tool", tool="extract_info_many")
+async def extract_info_many(paper_ids: List[str]) -> str:
+    """
+    Look up several papers at once across all topic directories.
+    
+    Args:
+        paper_ids: The IDs of the papers to look for
+        
+    Returns:
+        JSON string mapping each paper ID to its information, or to null if it is not saved
+    """
 
+    papers = await run_blocking(store.get_papers, paper_ids)
+    return json.dumps(papers, indent=2)
+
+@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True, openWorldHint=False))
+@timed("research_tool", tool="search_local")
+async def search_local(query: str, max_results: int = 10) -> str:
+    """
+    Full-text search over all locally saved papers, without contacting arXiv.
+    
+    Args:
+        query: Keywords to match against paper titles, authors and summaries
+        max_results: Maximum number of results to return (default: 10)
+        
+    Returns:
+        JSON string with the matching papers ranked by relevance, or a message if nothing matches
+    """
+    
+    hits = await run_blocking(store.search, query, max_results)
+    if not hits:
+        return f"No saved papers match '{query}'. Try search_papers to fetch papers from arXiv."
+    
+    return json.dumps(hits, indent=2)
+
+
+
+def _format_size(size_bytes: int) -> str:
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    if size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    return f"{size_bytes / (1024 * 1024):.1f} MB"
 
 @mcp.resource("papers://folders")
-def get_available_folders() -> str:
+@timed("research_resource", resource="papers://folders")
+async def get_available_folders() -> str:
     """
     List all available topic folders in the papers directory.
     
-    This resource provides a simple list of all available topic folders.
+    This resource lists every topic with its paper count, stored size and
+    last update, read from the store's topic catalog.
     """
-    folders = []
-    
-    # Get all topic directories
-    if os.path.exists(PAPER_DIR):
-        for topic_dir in os.listdir(PAPER_DIR):
-            topic_path = os.path.join(PAPER_DIR, topic_dir)
-            if os.path.isdir(topic_path):
-                papers_file = os.path.join(topic_path, "papers_info.json")
-                if os.path.exists(papers_file):
-                    folders.append(topic_dir)
+    catalog = await run_blocking(store.topic_catalog)
     
     # Create a simple markdown list
-    content = "# Available Topics\n\n"
-    if folders:
-        for folder in folders:
-            content += f"- {folder}\n"
-        content += f"\nUse @{folder} to access papers in that topic.\n"
+    parts = ["# Available Topics\n\n"]
+    if catalog:
+        for entry in catalog:
+            updated = datetime.fromtimestamp(entry['updated']).strftime("%Y-%m-%d %H:%M") if entry['updated'] else "unknown"
+            parts.append(
+                f"- {entry['topic']} ({entry['papers']} papers, "
+                f"{_format_size(entry['size_bytes'])}, updated {updated})\n"
+            )
+        parts.append(f"\nUse @{catalog[-1]['topic']} to access papers in that topic.\n")
     else:
-        content += "No topics found.\n"
+        parts.append("No topics found.\n")
     
+    return "".join(parts)
+
+@mcp.resource("catalog://topics")
+@timed("research_resource", resource="catalog://topics")
+async def get_topic_catalog() -> str:
+    """
+    Topic catalog as JSON: paper count, stored size in bytes and last-updated
+    time (ISO 8601) for every topic.
+    """
+    catalog = await run_blocking(store.topic_catalog)
+    entries = [
+        {**entry, 'updated': datetime.fromtimestamp(entry['updated']).isoformat() if entry['updated'] else None}
+        for entry in catalog
+    ]
+    return json.dumps(entries, indent=2)
+
+@mcp.resource("cache://arxiv")
+def get_arxiv_cache_stats() -> str:
+    """
+    Hit/miss counters of the arXiv query-result cache and request counters
+    (upstream requests, coalesced queries, retries) of the shared arXiv client.
+    """
+    return json.dumps({'cache': query_cache.stats(), 'client': client_stats}, indent=2)
+
+@mcp.resource("metrics://research")
+def get_metrics() -> str:
+    """
+    Latency summaries (p50/p95/p99, counts, errors) of this server's tools and
+    resources in the Prometheus text format. Times are measured inside the
+    server, so the difference to the client's mcp_tool_call_seconds is the
+    stdio transport and serialization overhead.
+    """
+    return metrics.render()
+
+def _parse_page_params(topic: str):
+    """Split 'topic?page=N&size=M' into (topic, page, size), clamping bad values."""
+    topic, _, query = topic.partition("?")
+    params = parse_qs(query)
+    try:
+        page = max(1, int(params.get("page", ["1"])[0]))
+    except ValueError:
+        page = 1
+    try:
+        size = int(params.get("size", [str(DEFAULT_PAGE_SIZE)])[0])
+    except ValueError:
+        size = DEFAULT_PAGE_SIZE
+    return topic, page, min(max(1, size), MAX_PAGE_SIZE)
+
+
+def _render_topic_page(topic: str, page: int, size: int) -> str:
+    """Render one page of a topic as markdown, reusing cached renders of the same topic version."""
+    topic_dir = topic.lower().replace(" ", "_")
+    version = store.topic_version(topic_dir)
+    if version is None:
+        return f"# No papers found for topic: {topic}\n\nTry searching for papers on this topic first."
+
+    cache_key = (topic_dir, version, page, size)
+    content = render_cache.get(cache_key)
+    if content is not None:
+        return content
+
+    result = store.get_topic_page(topic_dir, (page - 1) * size, size)
+    if result is None:
+        return f"# No papers found for topic: {topic}\n\nTry searching for papers on this topic first."
+    total, papers_data = result
+    pages = max(1, math.ceil(total / size))
+
+    # Create markdown content with paper details
+    parts = [
+        f"# Papers on {topic.replace('_', ' ').title()}\n\n",
+        f"Total papers: {total}\n\n",
+    ]
+    if pages > 1:
+        parts.append(f"Page {page} of {pages} ({size} papers per page)\n\n")
+    if not papers_data:
+        parts.append(f"Page {page} is out of range.\n\n")
+
+    for paper_id, paper_info in papers_data.items():
+        parts.extend((
+            f"## {paper_info['title']}\n",
+            f"- **Paper ID**: {paper_id}\n",
+            f"- **Authors**: {', '.join(paper_info['authors'])}\n",
+            f"- **Published**: {paper_info['published']}\n",
+            f"- **PDF URL**: [{paper_info['pdf_url']}]({paper_info['pdf_url']})\n\n",
+            f"### Summary\n{paper_info['summary'][:500]}...\n\n",
+            "---\n\n",
+        ))
+
+    if page < pages:
+        parts.append(f"Next page: papers://{topic_dir}?page={page + 1}&size={size}\n")
+
+    content = "".join(parts)
+    render_cache.set(cache_key, content)
     return content
 
 @mcp.resource("papers://{topic}")
-def get_topic_papers(topic: str) -> str:
+@timed("research_resource", resource="papers://{topic}")
+async def get_topic_papers(topic: str) -> str:
     """
-    Get detailed information about papers on a specific topic.
+    Get detailed information about papers on a specific topic, one page at a time.
     
     Args:
-        topic: The research topic to retrieve papers for
+        topic: The research topic to retrieve papers for, optionally followed by
+            '?page=N&size=M' (defaults: page 1, 20 papers per page)
     """
-    topic_dir = topic.lower().replace(" ", "_")
-    papers_file = os.path.join(PAPER_DIR, topic_dir, "papers_info.json")
-    
-    if not os.path.exists(papers_file):
-        return f"# No papers found for topic: {topic}\n\nTry searching for papers on this topic first."
+    topic, page, size = _parse_page_params(topic)
     
     try:
-        with open(papers_file, 'r') as f:
-            papers_data = json.load(f)
-        
-        # Create markdown content with paper details
-        content = f"# Papers on {topic.replace('_', ' ').title()}\n\n"
-        content += f"Total papers: {len(papers_data)}\n\n"
-        
-        for paper_id, paper_info in papers_data.items():
-            content += f"## {paper_info['title']}\n"
-            content += f"- **Paper ID**: {paper_id}\n"
-            content += f"- **Authors**: {', '.join(paper_info['authors'])}\n"
-            content += f"- **Published**: {paper_info['published']}\n"
-            content += f"- **PDF URL**: [{paper_info['pdf_url']}]({paper_info['pdf_url']})\n\n"
-            content += f"### Summary\n{paper_info['summary'][:500]}...\n\n"
-            content += "---\n\n"
-        
-        return content
+        return await run_blocking(_render_topic_page, topic, page, size)
     except json.JSONDecodeError:
         return f"# Error reading papers data for {topic}\n\nThe papers data file is corrupted."
 
@@ -168,7 +280,7 @@ def generate_search_prompt(topic: str, num_papers: int = 5) -> str:
     return f"""Search for {num_papers} academic papers about '{topic}' using the search_papers tool. 
 
 Follow these instructions:
-1. First, search for papers using search_papers(topic='{topic}', max_results={num_papers})
+1. First, search for papers using search_papers(topic='{topic}', max_results={num_papers}, include_details=True)
 2. For each paper found, extract and organize the following information:
    - Paper title
    - Authors
@@ -189,5 +301,6 @@ Follow these instructions:
 Please present both detailed information about each paper and a high-level synthesis of the research landscape in {topic}."""
 
 if __name__ == "__main__":
-    # Initialize and run the server
+    # Build the paper index once, then initialize and run the server
+    store.refresh()
     mcp.run(transport='stdio')
\ No newline at end of file
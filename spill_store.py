@@ -0,0 +1,155 @@
+"""
+Size limits for tool results, with oversized outputs spilled to disk.
+
+A tool result longer than its cap is written to the spill directory and
+replaced in the conversation by a short handle plus a preview. The model can
+then read further slices on demand with the local read_tool_output tool, so
+one large page or topic listing does not ride along in every later request.
+
+Spilled files are named by a hash of their content, so repeated identical
+outputs are stored once, and files older than TOOL_SPILL_TTL are pruned.
+
+Configuration (environment variables):
+    TOOL_RESULT_MAX_CHARS: default cap on a tool result (default 8000)
+    TOOL_RESULT_LIMITS: per-tool caps, e.g. "fetch=4000,search_local=12000"
+    TOOL_PREVIEW_CHARS: characters kept inline as a preview (default 1500)
+    TOOL_SPILL_DIR: where oversized outputs are stored (default .tool_spill)
+    TOOL_SPILL_TTL: seconds before spilled outputs are deleted (default 86400)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger('spill_store')
+
+READ_TOOL_NAME = "read_tool_output"
+
+# OpenAI tool definition for reading spilled outputs
+READ_TOOL = {
+    "type": "function",
+    "function": {
+        "name": READ_TOOL_NAME,
+        "description": "Read part of an earlier tool output that was too large to include in full. "
+                       "Use the handle and offset given in the truncated output.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "handle": {"type": "string", "description": "Handle of the stored output"},
+                "offset": {"type": "integer", "description": "Character offset to start reading at (default: 0)"},
+                "length": {"type": "integer", "description": "Number of characters to read (default: 4000)"}
+            },
+            "required": ["handle"]
+        }
+    }
+}
+
+HANDLE_PATTERN = re.compile(r"^spill-[0-9a-f]{16}$")
+MAX_READ_CHARS = 20000
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """Parse "tool=chars,tool=chars" into a dict, skipping malformed entries."""
+    limits = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        try:
+            limits[name.strip()] = int(value)
+        except ValueError:
+            if item.strip():
+                logger.warning("Ignoring invalid tool result limit: %r", item)
+    return limits
+
+
+class SpillStore:
+    """Caps tool results and stores the oversized ones for later reads."""
+
+    def __init__(self, directory: Optional[str] = None, default_limit: Optional[int] = None,
+                 limits: Optional[Dict[str, int]] = None, preview_chars: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        self.directory = directory or os.environ.get("TOOL_SPILL_DIR", ".tool_spill")
+        self.default_limit = default_limit or int(os.environ.get("TOOL_RESULT_MAX_CHARS", "8000"))
+        self.limits = limits if limits is not None else _parse_limits(os.environ.get("TOOL_RESULT_LIMITS", ""))
+        self.preview_chars = preview_chars or int(os.environ.get("TOOL_PREVIEW_CHARS", "1500"))
+        self.ttl = ttl if ttl is not None else float(os.environ.get("TOOL_SPILL_TTL", "86400"))
+        self.spilled = 0
+        self.prune()
+
+    def limit_for(self, tool_name: str) -> int:
+        return self.limits.get(tool_name, self.default_limit)
+
+    def _path(self, handle: str) -> str:
+        return os.path.join(self.directory, f"{handle}.txt")
+
+    def put(self, text: str) -> str:
+        """Store text and return its handle."""
+        handle = "spill-" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        path = self._path(handle)
+        if os.path.exists(path):
+            # Same content seen before; refresh its age so it is not pruned
+            os.utime(path)
+            return handle
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as spill_file:
+            spill_file.write(text)
+        os.replace(tmp_path, path)
+        return handle
+
+    def cap(self, tool_name: str, text: str) -> str:
+        """
+        Return text unchanged if it fits the tool's cap, otherwise store it and
+        return a handle with a preview and instructions for reading the rest.
+        """
+        limit = self.limit_for(tool_name)
+        if len(text) <= limit:
+            return text
+
+        handle = self.put(text)
+        self.spilled += 1
+        logger.info("Spilled %d characters of %s output to %s", len(text), tool_name, handle)
+        # A tool's own cap may be smaller than the default preview
+        preview_chars = min(self.preview_chars, limit)
+        return (
+            f"[Output of {tool_name} is {len(text)} characters; stored as {handle}. "
+            f"The first {preview_chars} characters follow.]\n"
+            f"{text[:preview_chars]}\n"
+            f"[Call {READ_TOOL_NAME}(handle=\"{handle}\", offset={preview_chars}) to read more.]"
+        )
+
+    def read(self, handle: str, offset: int = 0, length: int = 4000) -> str:
+        """Return a slice of a stored output, with its position in the whole."""
+        if not HANDLE_PATTERN.match(handle or ""):
+            return f"Invalid handle: {handle}"
+        try:
+            with open(self._path(handle), "r", encoding="utf-8") as spill_file:
+                text = spill_file.read()
+        except FileNotFoundError:
+            return f"No stored output with handle {handle}; it may have expired."
+
+        offset = max(0, int(offset))
+        length = min(max(1, int(length)), MAX_READ_CHARS)
+        end = min(len(text), offset + length)
+        header = f"[{handle}: characters {offset}-{end} of {len(text)}]\n"
+        if end < len(text):
+            return f"{header}{text[offset:end]}\n[Continue with offset={end}.]"
+        return header + text[offset:end]
+
+    def prune(self) -> int:
+        """Delete stored outputs older than the TTL; return how many were removed."""
+        if not os.path.isdir(self.directory):
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
@@ -111,6 +111,10 @@ document.addEventListener("DOMContentLoaded", () => {
     if (data.role === "user") {
       addUserMessage(data.content)
     } else if (data.role === "assistant") {
+      // A failed streamed turn ends with an error message instead of
+      // assistant_done; close its draft so the next answer gets a new bubble
+      streamingMessage = null
+      streamingText = ""
       addAssistantMessage(data.content)
     }
 
@@ -118,6 +122,43 @@ document.addEventListener("DOMContentLoaded", () => {
     scrollToBottom()
   })
 
+  // Handle streamed assistant text: render deltas into a draft message as they arrive
+  let streamingMessage = null
+  let streamingText = ""
+  let renderPending = false
+
+  socket.on("assistant_delta", (data) => {
+    removeTypingIndicator()
+    if (!streamingMessage) {
+      streamingMessage = addAssistantMessage("")
+      streamingText = ""
+    }
+    streamingText += data.content
+    // Re-render at most once per frame however fast deltas arrive
+    if (!renderPending) {
+      renderPending = true
+      requestAnimationFrame(() => {
+        renderPending = false
+        if (streamingMessage) {
+          streamingMessage.innerHTML = marked.parse(streamingText)
+          scrollToBottom()
+        }
+      })
+    }
+  })
+
+  socket.on("assistant_done", (data) => {
+    removeTypingIndicator()
+    const target = streamingMessage || addAssistantMessage("")
+    target.innerHTML = marked.parse(data.content || streamingText)
+    target.querySelectorAll("pre code").forEach((block) => {
+      hljs.highlightElement(block)
+    })
+    streamingMessage = null
+    streamingText = ""
+    scrollToBottom()
+  })
+
   // Handle tool outputs
   socket.on("tool_output", (data) => {
     console.log("Received tool output:", data)
@@ -214,6 +255,9 @@ document.addEventListener("DOMContentLoaded", () => {
     messageDiv.querySelectorAll("pre code").forEach((block) => {
       hljs.highlightElement(block)
     })
+
+    // Return the content element so streamed messages can be updated in place
+    return messageDiv.querySelector(".markdown-content")
   }
 
   function addSystemMessage(content) {
@@ -0,0 +1,145 @@
+"""
+Minimal OpenAI-compatible chat completions server for local testing.
+
+It answers POST /v1/chat/completions by echoing the last user message, with
+an optional artificial delay, in both regular and streaming (SSE) mode. Point
+the chatbot at it to exercise the full request path without network access
+or API costs:
+
+    python stub_llm_server.py --port 8001 --delay 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python mcp_chatbot.py
+
+Requests are served on separate threads, so concurrent conversations overlap
+instead of queueing behind each other.
+"""
+
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def build_reply(request: dict) -> str:
+    """Text the stub answers with: an echo of the last user message."""
+    for message in reversed(request.get("messages", [])):
+        if message.get("role") == "user":
+            return f"Echo: {message.get('content') or ''}"
+    return "Echo:"
+
+
+def usage(request: dict, reply: str) -> dict:
+    # Rough token counts (4 characters per token) so usage tracking has data
+    prompt_chars = sum(len(json.dumps(message)) for message in request.get("messages", []))
+    prompt_tokens = prompt_chars // 4
+    completion_tokens = max(1, len(reply) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        reply = self.server.build_reply(request)
+        time.sleep(self.delay)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = request.get("model", "stub")
+        message = reply if isinstance(reply, dict) else {"role": "assistant", "content": reply}
+        text = message.get("content") or ""
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": usage(request, text)
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send_chunk(delta, reason=None, chunk_usage=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": reason}] if delta is not None else [],
+            }
+            if chunk_usage is not None:
+                chunk["usage"] = chunk_usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        send_chunk({"role": "assistant", "content": ""})
+        for index, word in enumerate(text.split(" ") if text else []):
+            send_chunk({"content": word if index == 0 else " " + word})
+        for index, tool_call in enumerate(message.get("tool_calls") or []):
+            send_chunk({"tool_calls": [{"index": index, **tool_call}]})
+        send_chunk({}, finish_reason)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send_chunk(None, chunk_usage=usage(request, text))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8001, delay: float = 0.0,
+                reply_builder=build_reply) -> ThreadingHTTPServer:
+    """
+    Create (but do not start) a stub server.
+
+    reply_builder receives the parsed request and returns either the reply
+    text or a complete assistant message dict (e.g. one with tool_calls).
+    """
+    handler = type("ConfiguredStubLLMHandler", (StubLLMHandler,), {"delay": delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.build_reply = reply_builder
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before answering")
+    cli_args = parser.parse_args()
+
+    server = make_server(cli_args.host, cli_args.port, cli_args.delay)
+    print(f"Stub LLM listening on http://{cli_args.host}:{cli_args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,249 @@
+"""
+Supervision of the chatbot's MCP server connections.
+
+Every server runs under a ServerHandle: one asyncio task that starts the
+stdio process, initializes the session and keeps both open until it is told
+to stop, so the connection is always opened and closed by the same task.
+
+ServerSupervisor pings every active session at a fixed interval. A server
+that stops answering (crashed, or stuck past the ping timeout) is replaced in
+the background: a new handle is started, or a pre-initialized warm spare is
+taken if one is ready, and the chatbot's on_swap callback re-routes the
+server's tools, prompts and resources to the new session in one step before
+the old process is shut down.
+
+Configuration (environment variables):
+    MCP_HEALTH_INTERVAL: seconds between health checks, 0 disables them (default 15)
+    MCP_PING_TIMEOUT: seconds a ping may take before the server counts as stuck (default 5)
+    MCP_INIT_TIMEOUT: seconds allowed for starting and initializing a server (default 10)
+    MCP_WARM_SPARES: set to 1 to keep an initialized spare of every server
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable, Dict, Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from metrics import increment, observe
+
+logger = logging.getLogger('supervisor')
+
+
+class ServerHandle:
+    """One server process and its initialized session, owned by a dedicated task."""
+
+    def __init__(self, name: str, config: dict):
+        self.name = name
+        self.config = config
+        self.session: Optional[ClientSession] = None
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self, timeout: float) -> "ServerHandle":
+        """Start the server and wait until its session is initialized."""
+        self._task = asyncio.create_task(self._run(timeout), name=f"mcp-server-{self.name}")
+        try:
+            await self._ready.wait()
+        except asyncio.CancelledError:
+            # The caller gave up (e.g. a connect timeout); do not leave the process behind
+            self._stop.set()
+            self._task.cancel()
+            raise
+        if self.session is None:
+            raise self.error or RuntimeError(f"Server {self.name} exited during startup")
+        return self
+
+    async def _run(self, timeout: float) -> None:
+        server_params = StdioServerParameters(
+            command=self.config.get("command"),
+            args=self.config.get("args", []),
+            env=self.config.get("env"),
+            cwd=self.config.get("cwd", ".")
+        )
+        try:
+            async with AsyncExitStack() as stack:
+                read, write = await stack.enter_async_context(stdio_client(server_params))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await asyncio.wait_for(session.initialize(), timeout=timeout)
+                self.session = session
+                self.started_at = time.time()
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self.error = e
+            if self.session is not None:
+                logger.warning("Server %s connection closed: %s", self.name, e)
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Close the session and end the server process."""
+        self._stop.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        except Exception:
+            pass
+
+
+class ServerSupervisor:
+    """
+    Starts servers, checks their health and swaps in replacements.
+
+    on_swap(server_name, session) is awaited whenever a server gets a new
+    session, including the first one, and must register the session's tools,
+    prompts and resources.
+    """
+
+    def __init__(self, on_swap: Callable[[str, ClientSession], Awaitable[None]],
+                 interval: Optional[float] = None, ping_timeout: Optional[float] = None,
+                 init_timeout: Optional[float] = None, warm_spares: Optional[bool] = None):
+        self.on_swap = on_swap
+        self.interval = interval if interval is not None else float(os.environ.get("MCP_HEALTH_INTERVAL", "15"))
+        self.ping_timeout = ping_timeout if ping_timeout is not None else float(os.environ.get("MCP_PING_TIMEOUT", "5"))
+        self.init_timeout = init_timeout if init_timeout is not None else float(os.environ.get("MCP_INIT_TIMEOUT", "10"))
+        self.warm_spares = warm_spares if warm_spares is not None else os.environ.get("MCP_WARM_SPARES", "0") == "1"
+        self.handles: Dict[str, ServerHandle] = {}
+        self.spares: Dict[str, ServerHandle] = {}
+        self.stats: Dict[str, dict] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._background = set()
+        self._monitor: Optional[asyncio.Task] = None
+
+    def _spawn(self, coro) -> None:
+        """Run a coroutine in the background, keeping a reference until it is done."""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def start(self, server_name: str, config: dict) -> ServerHandle:
+        """Start a server for the first time and register its session."""
+        handle = await ServerHandle(server_name, config).start(self.init_timeout)
+        self.handles[server_name] = handle
+        self.stats[server_name] = {'restarts': 0, 'failed_checks': 0, 'last_ping_ms': None, 'last_restart': None}
+        self._locks[server_name] = asyncio.Lock()
+        await self.on_swap(server_name, handle.session)
+        if self.warm_spares:
+            self._spawn(self._prepare_spare(server_name))
+        return handle
+
+    def run(self) -> None:
+        """Start the periodic health checks (on the running event loop)."""
+        if self.interval > 0 and self._monitor is None:
+            self._monitor = asyncio.create_task(self._watch(), name="mcp-supervisor")
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.gather(*(self.check(name) for name in list(self.handles)))
+
+    async def ping(self, session: ClientSession) -> Optional[float]:
+        """Round-trip time of a ping in milliseconds, or None if it failed."""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(session.send_ping(), timeout=self.ping_timeout)
+        except Exception:
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    async def check(self, server_name: str) -> bool:
+        """Ping a server and restart it if it does not answer; return whether it was healthy."""
+        handle = self.handles.get(server_name)
+        if handle is None:
+            return False
+        elapsed = await self.ping(handle.session) if handle.alive else None
+        stats = self.stats[server_name]
+        if elapsed is not None:
+            stats['last_ping_ms'] = round(elapsed, 2)
+            observe("mcp_ping_seconds", elapsed / 1000, server=server_name)
+            return True
+        stats['failed_checks'] += 1
+        increment("mcp_failed_checks_total", server=server_name)
+        logger.warning("Server %s failed its health check, restarting", server_name)
+        await self.restart(server_name, failed=handle)
+        return False
+
+    def report_failure(self, server_name: str) -> None:
+        """Schedule an immediate health check, e.g. after a tool call failed."""
+        if server_name in self.handles:
+            self._spawn(self.check(server_name))
+
+    async def _prepare_spare(self, server_name: str) -> None:
+        handle = self.handles.get(server_name)
+        if handle is None or (server_name in self.spares and self.spares[server_name].alive):
+            return
+        try:
+            self.spares[server_name] = await ServerHandle(server_name, handle.config).start(self.init_timeout)
+            logger.info("Warm spare ready for %s", server_name)
+        except Exception as e:
+            logger.error("Error starting warm spare for %s: %s", server_name, e)
+
+    async def restart(self, server_name: str, failed: Optional[ServerHandle] = None) -> None:
+        """
+        Replace a server with a warm spare or a freshly started process.
+
+        Concurrent restarts of the same server collapse into one: a caller
+        that passes the handle it saw fail does nothing if it was already
+        replaced.
+        """
+        async with self._locks[server_name]:
+            old = self.handles[server_name]
+            if failed is not None and old is not failed:
+                return
+            start = time.perf_counter()
+
+            new = self.spares.pop(server_name, None)
+            if new is not None and (not new.alive or await self.ping(new.session) is None):
+                self._spawn(new.stop())
+                new = None
+            source = "warm spare"
+            if new is None:
+                source = "new process"
+                try:
+                    new = await ServerHandle(server_name, old.config).start(self.init_timeout)
+                except Exception as e:
+                    logger.error("Error restarting server %s: %s", server_name, e)
+                    return
+
+            await self.on_swap(server_name, new.session)
+            self.handles[server_name] = new
+            stats = self.stats[server_name]
+            stats['restarts'] += 1
+            stats['last_restart'] = time.time()
+            increment("mcp_restarts_total", server=server_name, source=source)
+            logger.info(
+                "Server %s switched to %s in %.0fms",
+                server_name, source, (time.perf_counter() - start) * 1000
+            )
+
+        self._spawn(old.stop())
+        if self.warm_spares:
+            self._spawn(self._prepare_spare(server_name))
+
+    async def close(self) -> None:
+        """Stop health checks and shut down every server and spare."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        for task in list(self._background):
+            task.cancel()
+        handles = list(self.handles.values()) + list(self.spares.values())
+        self.handles.clear()
+        self.spares.clear()
+        await asyncio.gather(*(handle.stop() for handle in handles), return_exceptions=True)
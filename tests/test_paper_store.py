@@ -0,0 +1,45 @@
+import threading
+
+from paper_store import SqlitePaperStore
+
+
+def make_papers(count):
+    return {
+        f"2401.{i:05d}": {
+            'title': f"Paper {i}",
+            'authors': [f"Author {i}"],
+            'summary': f"Summary of paper {i}",
+            'pdf_url': f"http://arxiv.org/pdf/2401.{i:05d}",
+            'published': "2024-01-01"
+        }
+        for i in range(count)
+    }
+
+
+def catalog_entry(store, topic_dir):
+    return next(entry for entry in store.topic_catalog() if entry['topic'] == topic_dir)
+
+
+def test_sqlite_concurrent_writers_count_papers_once(tmp_path):
+    papers = make_papers(5)
+    for run in range(10):
+        store = SqlitePaperStore(str(tmp_path / f"papers-{run}.db"))
+        barrier = threading.Barrier(4)
+
+        def write():
+            barrier.wait()
+            store.add_papers("topic", papers)
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        entry = catalog_entry(store, "topic")
+        reference = SqlitePaperStore(str(tmp_path / f"reference-{run}.db"))
+        reference.add_papers("topic", papers)
+        assert entry['papers'] == 5
+        assert entry['size_bytes'] == catalog_entry(reference, "topic")['size_bytes']
+        store.close()
+        reference.close()
@@ -0,0 +1,207 @@
+"""
+Relevance-based selection of the tools sent with each model request.
+
+Every request used to carry the schema of every tool of every connected
+server. The router instead ranks the tools against the current turn with a
+BM25 index over tool names, descriptions and parameter descriptions and sends
+only the best matches, plus any tool the turn has already used or mentioned
+(e.g. read_tool_output after a capped result).
+
+When nothing in the index matches the turn, or there are too few tools to be
+worth filtering, the full list is sent, so routing can only remove tools the
+query gives no reason to use. The tokens of the schemas left out are counted
+per request.
+
+Configuration (environment variables):
+    TOOL_ROUTER: set to 0 to always send every tool
+    TOOL_ROUTER_MAX_TOOLS: most tools selected by relevance per request (default 8)
+    TOOL_ROUTER_MIN_SCORE: BM25 score a tool needs to be selected (default 0.5)
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from history import content_text, count_tokens
+from metrics import increment, observe
+
+logger = logging.getLogger('tool_router')
+
+# Words too common in queries and tool descriptions to say anything about relevance
+STOPWORDS = {
+    "a", "about", "all", "also", "an", "and", "any", "are", "as", "at", "be", "by", "can",
+    "could", "do", "for", "from", "get", "give", "have", "how", "i", "in", "into", "is", "it",
+    "just", "me", "my", "of", "on", "or", "please", "should", "show", "some", "tell", "that",
+    "the", "their", "them", "there", "these", "they", "this", "those", "to", "use", "was",
+    "what", "when", "which", "will", "with", "would", "you", "your"
+}
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+# Tool names say the most about a tool, so their terms count this many times
+NAME_WEIGHT = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms of a text, splitting snake_case and camelCase and folding plurals."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "")
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def tool_name(tool: dict) -> str:
+    return tool["function"]["name"]
+
+
+def tool_document(tool: dict) -> List[str]:
+    """Terms describing a tool in the OpenAI format."""
+    function = tool["function"]
+    terms = tokenize(function["name"]) * NAME_WEIGHT + tokenize(function.get("description") or "")
+    properties = (function.get("parameters") or {}).get("properties") or {}
+    for name, schema in properties.items():
+        terms += tokenize(name) + tokenize(schema.get("description") or "")
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 over a small, fixed set of documents."""
+
+    def __init__(self, documents: List[List[str]]):
+        self.term_counts = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if documents else 0.0
+        frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for term, count in frequency.items()
+        }
+
+    def scores(self, query: List[str]) -> List[float]:
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            for term in set(query):
+                tf = counts.get(term)
+                if not tf:
+                    continue
+                norm = K1 * (1 - B + B * length / self.average_length) if self.average_length else K1
+                score += self.idf[term] * tf * (K1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+class ToolRouter:
+    """Picks the tools to send with a request, see the module docstring."""
+
+    def __init__(self, max_tools: Optional[int] = None, min_score: Optional[float] = None,
+                 enabled: Optional[bool] = None, model: str = "gpt-4o"):
+        self.enabled = enabled if enabled is not None else os.environ.get("TOOL_ROUTER", "1") != "0"
+        self.max_tools = max_tools or int(os.environ.get("TOOL_ROUTER_MAX_TOOLS", "8"))
+        self.min_score = min_score if min_score is not None else float(os.environ.get("TOOL_ROUTER_MIN_SCORE", "0.5"))
+        self.model = model
+        self.stats = {
+            'requests': 0,
+            'routed': 0,
+            'fallbacks': 0,
+            'tools_sent': 0,
+            'tokens_saved': 0
+        }
+        # Index of the current tool list, rebuilt when the list changes
+        self._signature: Optional[Tuple[str, ...]] = None
+        self._index: Optional[BM25Index] = None
+        self._tool_tokens: Dict[str, int] = {}
+
+    def _refresh(self, tools: List[dict]) -> None:
+        signature = tuple(json.dumps(tool, sort_keys=True) for tool in tools)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        self._index = BM25Index([tool_document(tool) for tool in tools])
+        self._tool_tokens = {
+            tool_name(tool): count_tokens(schema, self.model)
+            for tool, schema in zip(tools, signature)
+        }
+        logger.info("Indexed %d tools for routing", len(tools))
+
+    @staticmethod
+    def _current_turn(messages: List[dict]) -> List[dict]:
+        """Messages from the latest user message on."""
+        for position in range(len(messages) - 1, -1, -1):
+            if messages[position].get("role") == "user":
+                return messages[position:]
+        return messages
+
+    def _used_tools(self, turn: List[dict], names: Set[str]) -> Set[str]:
+        """Tools called in the turn or named in its tool outputs."""
+        used = set()
+        for message in turn:
+            for tool_call in message.get("tool_calls") or []:
+                used.add(tool_call["function"]["name"])
+            if message.get("role") == "tool":
+                text = content_text(message.get("content"))
+                used.update(name for name in names if name in text)
+        return used
+
+    def select(self, messages: List[dict], tools: List[dict]) -> List[dict]:
+        """
+        Return the tools to send with the next request for this history.
+
+        Args:
+            messages: The message history about to be sent (dicts)
+            tools: Every available tool in the OpenAI format
+
+        Returns:
+            A subset of tools in their original order, or tools itself
+        """
+        self.stats['requests'] += 1
+        if not self.enabled or len(tools) <= self.max_tools:
+            return self._send(tools, tools, "all")
+
+        self._refresh(tools)
+        turn = [message for message in self._current_turn(messages) if isinstance(message, dict)]
+        query = tokenize(" ".join(
+            content_text(message.get("content")) for message in turn if message.get("role") == "user"
+        ))
+        scores = self._index.scores(query)
+        ranked = sorted(
+            (position for position, score in enumerate(scores) if score >= self.min_score),
+            key=lambda position: scores[position], reverse=True
+        )
+        if not ranked:
+            # Nothing in the query points at a tool; let the model choose from all of them
+            return self._send(tools, tools, "fallback")
+
+        names = {tool_name(tool) for tool in tools}
+        keep = {tool_name(tools[position]) for position in ranked[:self.max_tools]}
+        keep |= self._used_tools(turn, names)
+        selected = [tool for tool in tools if tool_name(tool) in keep]
+        return self._send(tools, selected, "routed")
+
+    def _send(self, tools: List[dict], selected: List[dict], outcome: str) -> List[dict]:
+        saved = 0
+        if outcome == "routed":
+            self.stats['routed'] += 1
+            saved = sum(self._tool_tokens.get(tool_name(tool), 0) for tool in tools) - \
+                sum(self._tool_tokens.get(tool_name(tool), 0) for tool in selected)
+            self.stats['tokens_saved'] += saved
+            logger.debug("Routed %d of %d tools, %d schema tokens saved", len(selected), len(tools), saved)
+        elif outcome == "fallback":
+            self.stats['fallbacks'] += 1
+        self.stats['tools_sent'] += len(selected)
+        increment("tool_router_requests_total", outcome=outcome)
+        observe("tool_router_tools_sent", len(selected))
+        observe("tool_router_tokens_saved", saved)
+        increment("tool_router_tokens_saved_total", saved)
+        return selected
@@ -0,0 +1,125 @@
+"""
+Size-bounded LRU cache with per-entry time-to-live and optional persistence.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+logger = logging.getLogger('ttl_cache')
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed number of seconds.
+
+    When persist_path is given, entries are written to that JSON file on every
+    change and reloaded on startup, so they survive restarts. Persisted keys
+    must be tuples or strings and values must be JSON-serializable. Failing
+    to persist is logged and leaves the in-memory entries in place.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0, persist_path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if persist_path:
+            self._load()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._save()
+
+    def invalidate(self, predicate=None) -> int:
+        """Drop every entry (or those whose key matches predicate); return how many."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self._save()
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'persist_path': self.persist_path
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self) -> None:
+        try:
+            with open(self.persist_path, "r") as cache_file:
+                stored = json.load(cache_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        now = time.time()
+        for key, expires_at, value in stored:
+            if expires_at > now:
+                self._entries[tuple(key) if isinstance(key, list) else key] = (expires_at, value)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _save(self) -> None:
+        if not self.persist_path:
+            return
+        stored = [[key, expires_at, value] for key, (expires_at, value) in self._entries.items()]
+        # Write to a temporary file first so a crash never leaves a truncated
+        # cache; the name is per process since several may share the file
+        tmp_path = f"{self.persist_path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w") as cache_file:
+                json.dump(stored, cache_file)
+            os.replace(tmp_path, self.persist_path)
+        except (OSError, TypeError, ValueError) as e:
+            # The cached values are still served from memory
+            logger.warning("Could not persist cache to %s: %s", self.persist_path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass